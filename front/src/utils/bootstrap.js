@@ -0,0 +1,45 @@
+// Начальные данные страницы, встроенные сервером в index.html
+// (langed/server/bootstrap.py):
+//   <script id="bootstrap-data" type="application/json">{"responses": {url: данные}}</script>
+//
+// fetchPreloaded(url) отдаёт встроенный ответ вместо сетевого запроса, если он есть,
+// и делает обычный fetch, если нет. Встроенные ответы годятся только для первой
+// отрисовки: после неё (первый вызов + тик событийного цикла) они сбрасываются,
+// и повторные запросы (смена фильтра, обновление после изменений) идут в сеть.
+//
+// Пример:
+//   const response = await fetchPreloaded('/api/cities/')
+//   const cities = await response.json()
+
+let responses = null
+
+function loadResponses() {
+  if (responses === null) {
+    responses = {}
+    const element = document.getElementById('bootstrap-data')
+    if (element) {
+      try {
+        responses = JSON.parse(element.textContent).responses || {}
+      } catch (error) {
+        console.error('Некорректные начальные данные страницы:', error)
+      }
+      element.remove()
+      // Данные нужны только запросам первой отрисовки
+      setTimeout(() => {
+        responses = {}
+      }, 0)
+    }
+  }
+  return responses
+}
+
+export function fetchPreloaded(url, options) {
+  const preloaded = loadResponses()
+  if (!options && Object.prototype.hasOwnProperty.call(preloaded, url)) {
+    return Promise.resolve(new Response(JSON.stringify(preloaded[url]), {
+      status: 200,
+      headers: { 'Content-Type': 'application/json' }
+    }))
+  }
+  return fetch(url, options)
+}
@@ -0,0 +1,45 @@
+// Декодер колоночного формата API (?format=columns).
+//
+// Сервер отдаёт список объектов как схему колонок и массивы значений:
+//   { columns: ['id', { name: 'game', columns: ['id', 'name'] }], rows: [[1, [5, 'Игра']]] }
+// Колонка-объект описывает вложенный объект: её значение — строка,
+// список строк (если у колонки many: true) или null.
+// Пагинированный ответ приходит как { next, columns, rows }.
+//
+// Пример:
+//   const response = await fetch('/api/games/?format=columns')
+//   const games = decodeColumns(await response.json())
+
+function decodeValue(value, column) {
+  if (value === null || value === undefined) {
+    return null
+  }
+  if (column.many) {
+    return value.map(row => decodeRow(row, column.columns))
+  }
+  return decodeRow(value, column.columns)
+}
+
+function decodeRow(row, columns) {
+  const item = {}
+  columns.forEach((column, index) => {
+    if (typeof column === 'string') {
+      item[column] = row[index]
+    } else {
+      item[column.name] = decodeValue(row[index], column)
+    }
+  })
+  return item
+}
+
+// Возвращает массив объектов; для пагинированного ответа — { next, results }
+export function decodeColumns(data) {
+  if (!data || !Array.isArray(data.columns) || !Array.isArray(data.rows)) {
+    return data
+  }
+  const results = data.rows.map(row => decodeRow(row, data.columns))
+  if ('next' in data) {
+    return { next: data.next, results }
+  }
+  return results
+}
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+from importlib.util import find_spec
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,6 +46,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'server.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -124,6 +126,18 @@ MEDIA_URL = 'media/'
 
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Cache
+# Файловый кэш общий для всех процессов uWSGI; в private_settings можно задать, например, Redis
+try:
+    from langed.private_settings import CACHES
+except ImportError:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': BASE_DIR / 'cache',
+        }
+    }
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -171,8 +185,36 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'server.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'server.renderers.ColumnarJSONRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'server.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+# MessagePack доступен клиентам (Accept: application/msgpack), если установлен msgpack
+if find_spec('msgpack') is not None:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append('server.renderers.MessagePackRenderer')
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'].append('server.parsers.MessagePackParser')
+
+# Общий кэш ответов API для анонимных запросов (server.response_cache): алиас кэша
+# из CACHES и время жизни записей в секундах. В продакшене стоит указать общий кэш
+# (Redis/Memcached) в private_settings, чтобы его видели все процессы uWSGI.
+# None отключает кэш ответов.
+try:
+    from langed.private_settings import RESPONSE_CACHE_ALIAS
+except ImportError:
+    RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = 10 * 60
+
+# Ответы API меньше этого размера (в байтах) не сжимаются (server.compression)
+RESPONSE_COMPRESSION_MIN_SIZE = 1024
+
 # Session and CSRF settings for reverse proxy / HTTPS
 SESSION_COOKIE_SAMESITE = 'Lax'
 CSRF_COOKIE_SAMESITE = 'Lax'
@@ -20,17 +20,29 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.http import HttpResponse
 from django.views.decorators.cache import never_cache
+from server.bootstrap import inject_bootstrap
 from server.oidc import SafeOIDCCallbackView
 import os
 
+# Содержимое index.html, перечитывается при изменении файла (новой сборке)
+_index_cache = {'mtime': None, 'html': None}
+
+
+def read_index(index_path):
+    mtime = os.stat(index_path).st_mtime_ns
+    if _index_cache['mtime'] != mtime:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            _index_cache['html'] = f.read()
+        _index_cache['mtime'] = mtime
+    return _index_cache['html']
+
 
 @never_cache
 def vue_app(request):
-    """Отдаёт Vue.js SPA index.html"""
+    """Отдаёт Vue.js SPA index.html с начальными данными страницы (server.bootstrap)"""
     index_path = os.path.join(settings.BASE_DIR, 'static', 'vue', 'index.html')
     try:
-        with open(index_path, 'r', encoding='utf-8') as f:
-            return HttpResponse(f.read(), content_type='text/html')
+        html = read_index(index_path)
     except FileNotFoundError:
         return HttpResponse(
             '<h1>Vue.js не собран</h1>'
@@ -38,6 +50,7 @@ def vue_app(request):
             content_type='text/html',
             status=503
         )
+    return HttpResponse(inject_bootstrap(html, request), content_type='text/html')
 
 
 urlpatterns = [
@@ -50,7 +63,7 @@ urlpatterns = [
 
 # Catch-all для Vue Router — добавляется последним
 urlpatterns += [
-    re_path(r'^(?!(admin|api|static|media|oidc)/).*$', vue_app, name='vue_app'),
+    re_path(r'^(?!(?:admin|api|static|media|oidc)/).*$', vue_app, name='vue_app'),
 ]
 
 # Для dev-режима: отдача статики и медиа Django
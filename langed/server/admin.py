@@ -274,12 +274,14 @@ class RunAdmin(admin.ModelAdmin):
     get_rooms.short_description = 'Помещения'
     
     def get_players_count(self, obj):
-        return obj.registrations.filter(is_technician=False, status__in=['confirmed', 'pending']).count()
+        return obj.get_registered_count()
     get_players_count.short_description = 'Игроков'
+    get_players_count.admin_order_field = 'players_count'
     
     def get_technicians_count(self, obj):
-        return obj.registrations.filter(is_technician=True, status__in=['confirmed', 'pending']).count()
+        return obj.get_technicians_count()
     get_technicians_count.short_description = 'Игротехников'
+    get_technicians_count.admin_order_field = 'technicians_count'
 
 
 @admin.register(Registration)
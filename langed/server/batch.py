@@ -0,0 +1,41 @@
+"""
+Пакетная загрузка объектов по id: GET /api/runs/?ids=1,2,3.
+
+Список отдаётся тем же list с тем же queryset (select_related/prefetch и
+поля ?fields=), поэтому число запросов не зависит от количества id.
+Отсутствующие id пропускаются; пагинация для пакетного запроса отключена.
+"""
+from rest_framework.exceptions import ValidationError
+
+
+class BatchFetchMixin:
+    """Добавляет к list фильтр ?ids= (не больше max_batch_size id через запятую)"""
+    batch_query_param = 'ids'
+    max_batch_size = 200
+
+    def get_batch_ids(self):
+        """Список id из ?ids= или None, если параметр не передан"""
+        if self.action != 'list':
+            return None
+        raw = self.request.query_params.get(self.batch_query_param)
+        if raw is None:
+            return None
+        try:
+            ids = {int(value) for value in raw.split(',') if value.strip()}
+        except ValueError:
+            raise ValidationError({self.batch_query_param: 'Ожидается список id через запятую'})
+        if len(ids) > self.max_batch_size:
+            raise ValidationError({self.batch_query_param: f'Не больше {self.max_batch_size} id за запрос'})
+        return ids
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        ids = self.get_batch_ids()
+        if ids is not None:
+            queryset = queryset.filter(pk__in=ids)
+        return queryset
+
+    def paginate_queryset(self, queryset):
+        if self.get_batch_ids() is not None:
+            return None
+        return super().paginate_queryset(queryset)
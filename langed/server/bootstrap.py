@@ -0,0 +1,118 @@
+"""
+Начальные данные SPA, встроенные в index.html (vue_app).
+
+Для страницы заранее выполняются те же GET-запросы к API, которые её
+компоненты делают при открытии (текущий пользователь, города, ближайшие
+прогоны и проведения), и их ответы вставляются в HTML как JSON:
+
+    <script id="bootstrap-data" type="application/json">
+      {"responses": {"/api/auth/user/": {...}, "/api/cities/": [...]}}
+    </script>
+
+Клиент (front/src/utils/bootstrap.js) берёт эти ответы вместо сетевых
+запросов при первой отрисовке. Запросы выполняются обычными view API,
+поэтому анонимные ответы берутся из общего кэша ответов (response_cache)
+и форма данных совпадает с API один в один.
+"""
+import json
+from urllib.parse import urlsplit
+
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+
+BOOTSTRAP_ELEMENT_ID = 'bootstrap-data'
+
+# Запросы, которые страница делает при открытии: путь страницы → URL API.
+# Прогоны для гостей и для вошедших пользователей берутся из разных URL (см. Afisha.vue).
+ROUTE_REQUESTS = {
+    '/': (
+        '/api/runs/cities/',
+        '/api/convention-events/cities/',
+        '/api/convention-events/?time=upcoming',
+        '/api/cities/',
+    ),
+    '/conventions': (
+        '/api/conventions/',
+        '/api/cities/',
+    ),
+    '/games': (
+        '/api/games/',
+    ),
+}
+USER_URL = '/api/auth/user/'
+RUNS_URL = '/api/runs/?time=upcoming'
+RUNS_FEED_URL = '/api/runs/feed/?time=upcoming'
+
+# Символы, которые нельзя оставлять внутри <script> как есть; в JSON они
+# встречаются только внутри строк, где их можно заменить на \\uXXXX
+SCRIPT_ESCAPES = {
+    b'<': b'\\u003c',
+    b'>': b'\\u003e',
+    b'&': b'\\u0026',
+}
+
+
+def get_bootstrap_urls(request):
+    """URL API, ответы на которые нужны странице request.path"""
+    path = request.path.rstrip('/') or '/'
+    urls = [USER_URL, *ROUTE_REQUESTS.get(path, ())]
+    if path == '/':
+        urls.append(RUNS_URL if request.user.is_authenticated else RUNS_FEED_URL)
+    return urls
+
+
+def fetch_api(request, url):
+    """Выполняет GET к API от имени пользователя request; тело ответа в JSON или None"""
+    parts = urlsplit(url)
+    try:
+        match = resolve(parts.path)
+    except Resolver404:
+        return None
+
+    api_request = HttpRequest()
+    api_request.method = 'GET'
+    api_request.path = api_request.path_info = parts.path
+    api_request.META = {
+        **request.META,
+        'PATH_INFO': parts.path,
+        'QUERY_STRING': parts.query,
+        # Формат ответа выбирается как у SPA: ?format= или JSON по умолчанию
+        'HTTP_ACCEPT': '*/*',
+    }
+    api_request.META.pop('HTTP_ACCEPT_ENCODING', None)
+    api_request.META.pop('HTTP_IF_NONE_MATCH', None)
+    api_request.META.pop('HTTP_IF_MODIFIED_SINCE', None)
+    api_request.GET = QueryDict(parts.query)
+    api_request.COOKIES = request.COOKIES
+    api_request.user = request.user
+    if hasattr(request, 'session'):
+        api_request.session = request.session
+
+    response = match.func(api_request, *match.args, **match.kwargs)
+    if response.status_code != 200:
+        return None
+    if hasattr(response, 'render'):
+        response.render()
+    return response.content
+
+
+def build_bootstrap(request):
+    """JSON с ответами API для страницы, готовый к вставке в <script>"""
+    responses = []
+    for url in get_bootstrap_urls(request):
+        content = fetch_api(request, url)
+        if content is not None:
+            responses.append(json.dumps(url).encode('utf-8') + b':' + content)
+    data = b'{"responses":{' + b','.join(responses) + b'}}'
+    for char, escaped in SCRIPT_ESCAPES.items():
+        data = data.replace(char, escaped)
+    return data.decode('utf-8')
+
+
+def inject_bootstrap(html, request):
+    """Вставляет начальные данные в index.html перед </body>"""
+    script = (
+        f'<script id="{BOOTSTRAP_ELEMENT_ID}" type="application/json">'
+        f'{build_bootstrap(request)}</script>'
+    )
+    return html.replace('</body>', script + '</body>', 1)
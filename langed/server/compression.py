@@ -0,0 +1,137 @@
+"""
+Сжатие ответов API (brotli и gzip).
+
+CompressionMiddleware сжимает ответы текстовых форматов API (JSON, CSV,
+iCalendar и т.п.) размером от RESPONSE_COMPRESSION_MIN_SIZE байт в кодировку,
+которую принимает клиент; brotli предпочтительнее gzip. HTML не сжимается:
+в нём есть CSRF-токен (атака BREACH).
+
+Кэшированные ответы хранят уже сжатые варианты тела (precompress) и при
+выдаче из кэша передают их в response.precompressed — тогда middleware
+подставляет готовые байты и не сжимает тело повторно.
+
+brotli подключается, только если установлен пакет Brotli.
+"""
+import gzip
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli необязателен
+    brotli = None
+
+# Ответы меньше порога не сжимаем: выигрыш меньше накладных расходов
+DEFAULT_MIN_SIZE = 1024
+
+# Уровни сжатия на лету и для тел, которые сохраняются в кэше
+# (там сжатие выполняется один раз на запись, поэтому можно сжимать сильнее)
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+PRECOMPRESS_GZIP_LEVEL = 9
+PRECOMPRESS_BROTLI_QUALITY = 9
+
+COMPRESSIBLE_CONTENT_TYPES = {
+    'application/json',
+    'application/vnd.langed.columns+json',
+    'application/x-ndjson',
+    'application/msgpack',
+    'text/csv',
+    'text/calendar',
+    'text/plain',
+}
+
+
+def get_min_size():
+    return getattr(settings, 'RESPONSE_COMPRESSION_MIN_SIZE', DEFAULT_MIN_SIZE)
+
+
+def get_available_encodings():
+    """Поддерживаемые кодировки в порядке предпочтения"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def parse_accept_encoding(header):
+    """Заголовок Accept-Encoding в виде {кодировка: q}"""
+    qualities = {}
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name.strip():
+            qualities[name.strip().lower()] = quality
+    return qualities
+
+
+def choose_encoding(request):
+    """Лучшая из поддерживаемых кодировок, которую принимает клиент (q > 0), или None"""
+    qualities = parse_accept_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    for encoding in get_available_encodings():
+        if qualities.get(encoding, qualities.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def compress(content, encoding, precompress=False):
+    """Сжимает байты в gzip или br"""
+    if encoding == 'br':
+        quality = PRECOMPRESS_BROTLI_QUALITY if precompress else BROTLI_QUALITY
+        return brotli.compress(content, quality=quality)
+    level = PRECOMPRESS_GZIP_LEVEL if precompress else GZIP_LEVEL
+    # mtime=0 — одинаковое тело даёт одинаковые байты
+    return gzip.compress(content, compresslevel=level, mtime=0)
+
+
+def precompress(content):
+    """
+    Сжатые варианты тела для хранения в кэше: {'br': ..., 'gzip': ...}.
+    Маленькие тела не сжимаются — возвращается пустой словарь.
+    """
+    if len(content) < get_min_size():
+        return {}
+    return {encoding: compress(content, encoding, precompress=True) for encoding in get_available_encodings()}
+
+
+def is_compressible(response):
+    if response.streaming or response.has_header('Content-Encoding'):
+        return False
+    content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+    return content_type in COMPRESSIBLE_CONTENT_TYPES
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Сжимает ответы API в brotli или gzip. Готовые сжатые варианты тела
+    берутся из response.precompressed, если они есть.
+    """
+
+    def process_response(self, request, response):
+        if not is_compressible(response) or len(response.content) < get_min_size():
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request)
+        if encoding is None:
+            return response
+
+        precompressed = getattr(response, 'precompressed', None) or {}
+        compressed = precompressed.get(encoding) or compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # Сжатое тело отличается по байтам: сильный ETag становится слабым
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
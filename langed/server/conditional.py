@@ -0,0 +1,99 @@
+"""
+Условные GET-запросы (ETag / Last-Modified) для list и retrieve.
+
+Валидаторы считаются по отфильтрованному queryset (количество строк и
+максимальный updated_at) и по журналу auditlog для моделей, данные которых
+вложены в ответ: журнал фиксирует и удаления, и изменения M2M-связей, которые
+не отражаются в updated_at. Если данные не изменились, отвечаем 304,
+не сериализуя ответ.
+"""
+import hashlib
+
+from auditlog.models import LogEntry
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+class ConditionalGetMixin:
+    """
+    Добавляет ETag и Last-Modified к list и retrieve и отвечает 304 Not Modified.
+
+    `conditional_models` — модели, данные которых входят в ответ
+    (включая вложенные); их изменения по журналу аудита меняют валидаторы.
+    """
+    conditional_models = ()
+
+    def get_conditional_queryset(self):
+        """QuerySet, по которому считаются валидаторы (без тяжёлых аннотаций и prefetch)"""
+        return self.filter_queryset(self.get_queryset())
+
+    def get_validators(self, queryset):
+        model = queryset.model
+        aggregates = {'count': Count('pk')}
+        has_updated_at = any(field.name == 'updated_at' for field in model._meta.concrete_fields)
+        if has_updated_at:
+            aggregates['last_updated'] = Max('updated_at')
+        stats = queryset.order_by().aggregate(**aggregates)
+
+        # Изменения M2M со стороны пользователя (user.runs.add(...)) журнал записывает на модель пользователя
+        models = (model, get_user_model(), *self.conditional_models)
+        content_types = ContentType.objects.get_for_models(*models).values()
+        log = LogEntry.objects.filter(content_type__in=content_types).aggregate(
+            last_id=Max('id'), last_timestamp=Max('timestamp')
+        )
+
+        user = self.request.user
+        raw = '|'.join(str(value) for value in (
+            stats['count'], stats.get('last_updated'), log['last_id'],
+            user.pk if user.is_authenticated else '',
+            getattr(self.request, 'accepted_media_type', ''),
+        ))
+        etag = 'W/"%s"' % hashlib.md5(raw.encode('utf-8'), usedforsecurity=False).hexdigest()
+
+        timestamps = [value for value in (stats.get('last_updated'), log['last_timestamp']) if value]
+        last_modified = int(max(timestamps).timestamp()) if timestamps else None
+        return etag, last_modified
+
+    def set_validators(self, response, etag, last_modified):
+        if etag and not response.has_header('ETag'):
+            response['ETag'] = etag
+        if last_modified and not response.has_header('Last-Modified'):
+            response['Last-Modified'] = http_date(last_modified)
+        # Ответ зависит от пользователя; браузер должен каждый раз перепроверять его
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def conditional_response(self, request, queryset, render):
+        etag, last_modified = self.get_validators(queryset)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = render()
+            if not 200 <= response.status_code < 300:
+                return response
+        return self.set_validators(response, etag, last_modified)
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request,
+            self.get_conditional_queryset(),
+            lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            queryset = self.get_conditional_queryset().filter(
+                **{self.lookup_field: kwargs[lookup_url_kwarg]}
+            )
+        except (TypeError, ValueError, ValidationError):
+            # Некорректный id — обычный retrieve ответит 404
+            return super().retrieve(request, *args, **kwargs)
+        return self.conditional_response(
+            request,
+            queryset,
+            lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs)
+        )
@@ -0,0 +1,154 @@
+"""
+Фильтр по диапазону дат (?from=&to=&city_id=) и календарь по дням для
+месячного вида афиши (/api/runs/calendar/, /api/convention-events/calendar/).
+
+Границы диапазона — даты YYYY-MM-DD включительно в местном времени города:
+для прогонов Екатеринбурга ?from=2026-10-01 начинается с 00:00 по
+Екатеринбургу, а не по UTC. Прогоны хранят дату в UTC, поэтому для каждого
+часового пояса считаются свои границы в UTC и условие собирается по группам
+городов с этим поясом — так фильтр остаётся условием city_id + date
+и использует индекс Run(city, date). Даты проведений конвентов уже местные
+(DateField), проведение попадает в диапазон, если пересекается с ним.
+
+Календарь группирует объекты по местным дням:
+
+    /api/runs/calendar/?from=2026-10-01&to=2026-10-31&city_id=3
+    {"from": "2026-10-01", "to": "2026-10-31",
+     "days": {"2026-10-03": [{"id": 7, "time": "19:00", "game_id": 2, ...}]}}
+
+    /api/convention-events/calendar/?from=2026-10-01&to=2026-10-31
+    {"from": ..., "to": ..., "events": {"4": {"id": 4, "name": ..., ...}},
+     "days": {"2026-10-03": [4], "2026-10-04": [4]}}
+
+Дни без объектов в ответ не попадают.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+from .models import City
+from .timezones import DEFAULT_TIMEZONE, get_timezone
+
+# Самый длинный допустимый диапазон: календарь на год
+MAX_RANGE_DAYS = 366
+
+RUN_CALENDAR_FIELDS = (
+    'id', 'date', 'duration', 'game_id', 'game__name', 'city_id', 'city__timezone', 'convention_event_id',
+    'players_count', 'max_players', 'game__players_max', 'registration_open',
+)
+
+EVENT_CALENDAR_FIELDS = ('id', 'convention_id', 'convention__name', 'city_id', 'date_start', 'date_end')
+
+
+def parse_date(query_params, name):
+    raw = query_params.get(name)
+    if not raw:
+        return None
+    try:
+        return datetime.strptime(raw, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValidationError({name: 'Ожидается дата в формате ГГГГ-ММ-ДД'})
+
+
+def get_date_range(query_params, required=False):
+    """Диапазон (from, to) из параметров запроса; None, если не задан и не обязателен"""
+    date_from = parse_date(query_params, 'from')
+    date_to = parse_date(query_params, 'to')
+    if date_from is None and date_to is None and not required:
+        return None
+    if date_from is None or date_to is None:
+        raise ValidationError({'from' if date_from is None else 'to': 'Укажите обе границы диапазона: from и to'})
+    if date_from > date_to:
+        raise ValidationError({'to': 'Конец диапазона раньше начала'})
+    if (date_to - date_from).days >= MAX_RANGE_DAYS:
+        raise ValidationError({'to': f'Диапазон не длиннее {MAX_RANGE_DAYS} дней'})
+    return date_from, date_to
+
+
+def get_city_id(query_params):
+    raw = query_params.get('city_id')
+    if not raw:
+        return None
+    try:
+        return int(raw)
+    except ValueError:
+        raise ValidationError({'city_id': 'Ожидается id города'})
+
+
+def get_local_tz(timezone_name):
+    return get_timezone(timezone_name) or get_timezone(DEFAULT_TIMEZONE)
+
+
+def get_utc_bounds(date_from, date_to, timezone_name):
+    """Полуинтервал [начало from, начало дня после to) в UTC для часового пояса"""
+    tz = get_local_tz(timezone_name)
+    start = datetime.combine(date_from, time.min, tzinfo=tz)
+    end = datetime.combine(date_to + timedelta(days=1), time.min, tzinfo=tz)
+    return start.astimezone(dt_timezone.utc), end.astimezone(dt_timezone.utc)
+
+
+def filter_runs_by_range(queryset, date_range, city_id=None):
+    """Прогоны, местная дата которых попадает в диапазон (в городе city_id или во всех)"""
+    cities = City.objects.order_by()
+    if city_id is not None:
+        cities = cities.filter(pk=city_id)
+    city_ids_by_timezone = defaultdict(list)
+    for pk, timezone_name in cities.values_list('id', 'timezone'):
+        city_ids_by_timezone[timezone_name].append(pk)
+
+    condition = Q(pk__in=[])
+    for timezone_name, city_ids in city_ids_by_timezone.items():
+        start, end = get_utc_bounds(*date_range, timezone_name)
+        city_filter = {'city_id': city_ids[0]} if len(city_ids) == 1 else {'city_id__in': city_ids}
+        condition |= Q(**city_filter, date__gte=start, date__lt=end)
+    return queryset.filter(condition)
+
+
+def filter_events_by_range(queryset, date_range):
+    """Проведения, пересекающиеся с диапазоном"""
+    date_from, date_to = date_range
+    return queryset.filter(date_start__lte=date_to, date_end__gte=date_from)
+
+
+def build_run_calendar(queryset, date_range):
+    """Прогоны из отфильтрованного QuerySet, сгруппированные по местным дням"""
+    days = defaultdict(list)
+    for row in queryset.order_by('date').values(*RUN_CALENDAR_FIELDS):
+        local = row['date'].astimezone(get_local_tz(row['city__timezone']))
+        max_players = row['max_players'] if row['max_players'] is not None else row['game__players_max']
+        days[local.date().isoformat()].append({
+            'id': row['id'],
+            'time': local.strftime('%H:%M'),
+            'duration': row['duration'],
+            'game_id': row['game_id'],
+            'game_name': row['game__name'],
+            'city_id': row['city_id'],
+            'convention_event_id': row['convention_event_id'],
+            'players_count': row['players_count'],
+            'max_players': max_players,
+            'registration_open': row['registration_open'],
+        })
+    return {'from': date_range[0].isoformat(), 'to': date_range[1].isoformat(), 'days': dict(sorted(days.items()))}
+
+
+def build_event_calendar(queryset, date_range):
+    """Проведения из отфильтрованного QuerySet: каждое указано во всех своих днях внутри диапазона"""
+    date_from, date_to = date_range
+    events = {}
+    days = defaultdict(list)
+    for row in queryset.order_by('date_start', 'id').values(*EVENT_CALENDAR_FIELDS):
+        events[row['id']] = {
+            'id': row['id'],
+            'convention_id': row['convention_id'],
+            'name': row['convention__name'],
+            'city_id': row['city_id'],
+            'date_start': row['date_start'].isoformat(),
+            'date_end': row['date_end'].isoformat(),
+        }
+        day = max(row['date_start'], date_from)
+        while day <= min(row['date_end'], date_to):
+            days[day.isoformat()].append(row['id'])
+            day += timedelta(days=1)
+    return {'from': date_from.isoformat(), 'to': date_to.isoformat(), 'events': events, 'days': dict(sorted(days.items()))}
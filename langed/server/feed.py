@@ -0,0 +1,147 @@
+"""
+Лента прогонов для афиши без построения моделей и ModelSerializer.
+
+Строки прогонов, мастеров, помещений и регистраций выбираются через values()
+фиксированным числом запросов (4 на любую страницу) и собираются в обычные
+словари. Форма элементов совпадает с RunSerializer для полей, которые
+использует Afisha.vue; персональные поля (can_edit,
+current_user_registration) в ленте не отдаются — она одинакова для всех.
+"""
+from collections import defaultdict
+
+from .models import Registration, Run
+from .serializers import NaiveDateTimeField
+from .streaming import iter_chunks
+from .timezones import to_local_iso_many
+
+RUN_FEED_FIELDS = (
+    'id', 'date', 'duration', 'max_players', 'registration_open', 'convention_event_id', 'players_count',
+    'game_id', 'game__name', 'game__players_min', 'game__players_max',
+    'game__female_roles_min', 'game__female_roles_max',
+    'game__male_roles_min', 'game__male_roles_max', 'game__technicians',
+    'city__name', 'city__timezone', 'convention_event__convention__name',
+)
+
+GAME_FEED_FIELDS = (
+    'name', 'players_min', 'players_max',
+    'female_roles_min', 'female_roles_max',
+    'male_roles_min', 'male_roles_max', 'technicians',
+)
+
+_date_field = NaiveDateTimeField()
+
+
+def _display_name(username, first_name, last_name):
+    """То же, что UserBriefSerializer.get_display_name"""
+    if first_name or last_name:
+        return f'{first_name} {last_name}'.strip()
+    return username
+
+
+def _group_masters(run_ids):
+    masters = defaultdict(list)
+    rows = Run.masters.through.objects.filter(run_id__in=run_ids).order_by('id').values_list(
+        'run_id', 'user_id', 'user__username', 'user__first_name', 'user__last_name'
+    )
+    for run_id, user_id, username, first_name, last_name in rows:
+        masters[run_id].append({
+            'id': user_id,
+            'username': username,
+            'display_name': _display_name(username, first_name, last_name),
+        })
+    return masters
+
+
+def _group_rooms(run_ids):
+    rooms = defaultdict(list)
+    venue_names = defaultdict(set)
+    rows = Run.rooms.through.objects.filter(run_id__in=run_ids).order_by('room__name').values_list(
+        'run_id', 'room_id', 'room__name', 'room__blackbox', 'room__venue_id', 'room__venue__name'
+    )
+    for run_id, room_id, name, blackbox, venue_id, venue_name in rows:
+        rooms[run_id].append({'id': room_id, 'name': name, 'blackbox': blackbox, 'venue_id': venue_id})
+        if venue_name:
+            venue_names[run_id].add(venue_name)
+    return rooms, venue_names
+
+
+def _group_registrations(run_ids):
+    registrations = defaultdict(list)
+    rows = Registration.objects.filter(run_id__in=run_ids).values_list(
+        'run_id', 'id', 'user_id', 'user__username', 'user__first_name', 'user__last_name',
+        'role_preference', 'is_technician', 'status'
+    )
+    for run_id, pk, user_id, username, first_name, last_name, role, is_technician, status in rows:
+        registrations[run_id].append({
+            'id': pk,
+            'user': {
+                'id': user_id,
+                'username': username,
+                'display_name': _display_name(username, first_name, last_name),
+            },
+            'role_preference': role,
+            'is_technician': is_technician,
+            'status': status,
+        })
+    return registrations
+
+
+def build_run_feed(queryset):
+    """
+    Собирает ленту прогонов из отфильтрованного и упорядоченного QuerySet.
+    Возвращает список словарей в формате RunSerializer.
+    """
+    return build_run_feed_items(list(queryset.values(*RUN_FEED_FIELDS)))
+
+
+def iter_run_feed_chunks(queryset, chunk_size):
+    """Лента пачками по chunk_size прогонов (для потоковой отдачи, см. streaming.py)"""
+    rows = queryset.values(*RUN_FEED_FIELDS).iterator(chunk_size=chunk_size)
+    for chunk in iter_chunks(rows, chunk_size):
+        yield build_run_feed_items(chunk)
+
+
+def build_run_feed_items(rows):
+    """Элементы ленты для строк прогонов из values(*RUN_FEED_FIELDS)"""
+    run_ids = [row['id'] for row in rows]
+    if not run_ids:
+        return []
+
+    masters = _group_masters(run_ids)
+    rooms, venue_names = _group_rooms(run_ids)
+    registrations = _group_registrations(run_ids)
+    local_dates = to_local_iso_many((row['date'], row['city__timezone']) for row in rows)
+
+    feed = []
+    for row, date_local in zip(rows, local_dates):
+        run_id = row['id']
+        max_players = row['max_players'] if row['max_players'] is not None else row['game__players_max']
+        registered_count = row['players_count']
+        available_slots = max(0, max_players - registered_count)
+        run_venue_names = venue_names[run_id]
+
+        game = {'id': row['game_id']}
+        game.update((field, row[f'game__{field}']) for field in GAME_FEED_FIELDS)
+
+        feed.append({
+            'id': run_id,
+            'game': game,
+            'masters': masters[run_id],
+            'date': _date_field.to_representation(row['date']),
+            'date_local': date_local,
+            'duration': row['duration'],
+            'city': row['city__name'],
+            'city_timezone': row['city__timezone'],
+            'rooms': rooms[run_id],
+            'venue_name': ', '.join(sorted(run_venue_names)) if run_venue_names else None,
+            'convention_event': row['convention_event_id'],
+            'convention_name': row['convention_event__convention__name'],
+            'max_players': row['max_players'],
+            'registration_open': row['registration_open'],
+            'registrations': registrations[run_id],
+            'registered_count': registered_count,
+            'available_slots': available_slots,
+            'is_full': available_slots == 0,
+            'effective_max_players': max_players,
+        })
+    return feed
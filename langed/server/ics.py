@@ -0,0 +1,316 @@
+"""
+Календари iCalendar (.ics) для подписки из календарных приложений:
+
+    /api/calendar/cities/<id>.ics              — ближайшие прогоны города
+    /api/calendar/convention-events/<id>.ics   — прогоны и общие события проведения
+    /api/calendar/users/<токен>.ics            — регистрации пользователя
+
+Календарные приложения опрашивают подписки часто и без авторизации,
+поэтому календарь пользователя открывается по подписанному токену из его
+ссылки (calendar_url в /api/auth/user/), а не по сессии.
+
+Валидаторы (ETag, Last-Modified) считаются двумя запросами: количество
+строк и последние updated_at (прогонов, игр, помещений и площадок)
+подзапросами к объекту календаря и последняя запись журнала auditlog об
+изменении помещений прогонов (M2M не меняет Run.updated_at) и о городах
+(у City нет updated_at). Опрос, не нашедший изменений, получает 304 и
+больше ничего не стоит. Сам календарь
+отдаётся потоком: строки читаются через .iterator() пачками с prefetch
+помещений на пачку и сразу пишутся в ответ. Время событий — в UTC.
+"""
+import hashlib
+from datetime import timedelta, timezone as dt_timezone
+
+from auditlog.models import LogEntry
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core import signing
+from django.db.models import Count, Max, OuterRef, Q, Subquery
+from django.http import Http404, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from .models import City, CommonEvent, ConventionEvent, Registration, Run
+
+CONTENT_TYPE = 'text/calendar; charset=utf-8'
+PRODID = '-//langed//Afisha//RU'
+
+# Прошедшие события остаются в календаре ещё какое-то время, чтобы не пропадать сразу после начала
+PAST_DAYS = 30
+
+# Рекомендуемый интервал опроса для календарных приложений
+REFRESH_INTERVAL = 'PT1H'
+
+# Размер пачки .iterator() (для каждой пачки — свой prefetch помещений)
+CHUNK_SIZE = 500
+
+USER_TOKEN_SALT = 'server.ics.user'
+
+REGISTRATION_EVENT_STATUSES = {'confirmed': 'CONFIRMED', 'pending': 'TENTATIVE', 'waitlist': 'TENTATIVE'}
+
+
+def escape_text(value):
+    """Экранирование значения TEXT (RFC 5545, 3.3.11)"""
+    return (
+        str(value).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '\\n')
+    )
+
+
+def fold_line(line):
+    """Строка содержимого с переносами по 75 октетов (RFC 5545, 3.1), без разрыва символов UTF-8"""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    current, size, limit = [], 0, 75
+    for char in line:
+        char_size = len(char.encode('utf-8'))
+        if size + char_size > limit:
+            parts.append(''.join(current))
+            # Продолжение начинается с пробела, который входит в 75 октетов
+            current, size, limit = [], 0, 74
+        current.append(char)
+        size += char_size
+    parts.append(''.join(current))
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def format_datetime(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def build_event(uid, start, duration, summary, updated_at, location=None, description=None, url=None, status=None):
+    """Блок VEVENT одной строкой"""
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{uid}',
+        f'DTSTAMP:{format_datetime(updated_at)}',
+        f'LAST-MODIFIED:{format_datetime(updated_at)}',
+        f'DTSTART:{format_datetime(start)}',
+        f'DTEND:{format_datetime(start + timedelta(minutes=duration))}',
+        f'SUMMARY:{escape_text(summary)}',
+    ]
+    if location:
+        lines.append(f'LOCATION:{escape_text(location)}')
+    if description:
+        lines.append(f'DESCRIPTION:{escape_text(description)}')
+    if url:
+        lines.append(f'URL:{url}')
+    if status:
+        lines.append(f'STATUS:{status}')
+    lines.append('END:VEVENT')
+    return ''.join(fold_line(line) for line in lines)
+
+
+def get_run_location(run):
+    """Площадки и помещения прогона (rooms берутся из prefetch пачки), иначе город"""
+    rooms = list(run.rooms.all())
+    if rooms:
+        venues = sorted({room.venue.name for room in rooms})
+        return f'{", ".join(venues)} ({", ".join(room.name for room in rooms)}), {run.city.name}'
+    return run.city.name
+
+
+def build_run_event(run, request, host, status=None):
+    description = run.convention_event.convention.name if run.convention_event_id else None
+    return build_event(
+        f'run-{run.pk}@{host}', run.date, run.duration, run.game.name, run.updated_at,
+        location=get_run_location(run),
+        description=description,
+        url=request.build_absolute_uri(f'/?run={run.pk}'),
+        status=status,
+    )
+
+
+def get_runs_queryset(queryset):
+    return queryset.select_related('game', 'city', 'convention_event__convention').prefetch_related(
+        'rooms__venue'
+    ).only(
+        'id', 'date', 'duration', 'updated_at', 'city__name', 'game__name',
+        'convention_event_id', 'convention_event__convention__name',
+    ).order_by('date', 'id')
+
+
+def stream_calendar(name, events):
+    """Генератор строк календаря: заголовок, события из events, окончание"""
+    yield ''.join(fold_line(line) for line in (
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape_text(name)}',
+        f'REFRESH-INTERVAL;VALUE=DURATION:{REFRESH_INTERVAL}',
+        f'X-PUBLISHED-TTL:{REFRESH_INTERVAL}',
+    ))
+    yield from events
+    yield 'END:VCALENDAR\r\n'
+
+
+def related_stats(prefix, queryset, outer_field, **aggregates):
+    """
+    Подзапросы с агрегатами связанных строк для аннотации объекта календаря:
+    related_stats('runs', Run.objects.all(), 'city', count=Count('id')) → {'runs_count': Subquery(...)}
+    """
+    grouped = queryset.filter(**{outer_field: OuterRef('pk')}).order_by().values(outer_field)
+    return {
+        f'{prefix}_{name}': Subquery(grouped.annotate(value=aggregate).values('value'))
+        for name, aggregate in aggregates.items()
+    }
+
+
+def run_stats(prefix=''):
+    """Агрегаты прогонов для related_stats; prefix — путь к прогону ('run__' для регистраций)"""
+    return {
+        'updated': Max(f'{prefix}updated_at'),
+        'games_updated': Max(f'{prefix}game__updated_at'),
+        'conventions_updated': Max(f'{prefix}convention_event__convention__updated_at'),
+        'rooms_count': Count(f'{prefix}rooms'),
+        'rooms_updated': Max(f'{prefix}rooms__updated_at'),
+        'venues_updated': Max(f'{prefix}rooms__venue__updated_at'),
+    }
+
+
+def get_location_log_id(runs):
+    """Последняя запись журнала об изменении помещений прогонов runs или их городов"""
+    content_types = ContentType.objects.get_for_models(Run, City)
+    return LogEntry.objects.filter(
+        Q(content_type=content_types[Run], object_id__in=runs.values('id'), changes__has_key='rooms') |
+        Q(content_type=content_types[City], object_id__in=runs.values('city_id'))
+    ).aggregate(last_id=Max('id'))['last_id']
+
+
+def get_validators(stats):
+    """ETag и Last-Modified по строке статистики календаря"""
+    raw = '|'.join(f'{key}={stats[key]}' for key in sorted(stats))
+    etag = '"%s"' % hashlib.md5(raw.encode('utf-8'), usedforsecurity=False).hexdigest()
+    timestamps = [value for value in stats.values() if hasattr(value, 'timestamp')]
+    last_modified = int(max(timestamps).timestamp()) if timestamps else None
+    return etag, last_modified
+
+
+def calendar_response(request, stats, filename, render, private=False):
+    """304 по валидаторам или потоковый ответ из генератора render()"""
+    etag, last_modified = get_validators(stats)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = StreamingHttpResponse(render(), content_type=CONTENT_TYPE)
+        response['Content-Disposition'] = f'inline; filename="{filename}"'
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    # Общие календари можно хранить в общих кэшах, но с перепроверкой; личный — только у клиента
+    patch_cache_control(response, no_cache=True, **({'private': True} if private else {'public': True}))
+    return response
+
+
+def get_user_token(user):
+    """Токен ссылки на календарь пользователя"""
+    return signing.Signer(salt=USER_TOKEN_SALT).sign(str(user.pk))
+
+
+def get_user_calendar_url(request, user):
+    return request.build_absolute_uri(reverse('calendar-user', kwargs={'token': get_user_token(user)}))
+
+
+@require_safe
+def city_calendar(request, city_id):
+    """Ближайшие прогоны города"""
+    since = timezone.now() - timedelta(days=PAST_DAYS)
+    runs = Run.objects.filter(city_id=city_id, date__gte=since)
+    aggregates = run_stats()
+    stats = City.objects.filter(pk=city_id).annotate(**related_stats(
+        'runs', Run.objects.filter(date__gte=since), 'city', count=Count('id'), **aggregates,
+    )).values('name', 'runs_count', *(f'runs_{name}' for name in aggregates)).first()
+    if stats is None:
+        raise Http404
+    stats['location_log'] = get_location_log_id(runs)
+
+    host = request.get_host()
+    return calendar_response(request, stats, f'city-{city_id}.ics', lambda: stream_calendar(
+        f'Афиша: {stats["name"]}',
+        (build_run_event(run, request, host) for run in get_runs_queryset(runs).iterator(chunk_size=CHUNK_SIZE)),
+    ))
+
+
+@require_safe
+def convention_event_calendar(request, event_id):
+    """Прогоны и общие события проведения конвента"""
+    aggregates = run_stats()
+    stats = ConventionEvent.objects.filter(pk=event_id).annotate(
+        **related_stats('runs', Run.objects.all(), 'convention_event', count=Count('id'), **aggregates),
+        **related_stats(
+            'common', CommonEvent.objects.all(), 'convention_event',
+            count=Count('id'), updated=Max('updated_at'),
+        ),
+    ).values(
+        'convention__name', 'updated_at', 'convention__updated_at',
+        'runs_count', *(f'runs_{name}' for name in aggregates), 'common_count', 'common_updated',
+    ).first()
+    if stats is None:
+        raise Http404
+    stats['location_log'] = get_location_log_id(Run.objects.filter(convention_event_id=event_id))
+
+    host = request.get_host()
+    schedule_url = request.build_absolute_uri(f'/schedule/{event_id}')
+
+    def events():
+        runs = get_runs_queryset(Run.objects.filter(convention_event_id=event_id))
+        for run in runs.iterator(chunk_size=CHUNK_SIZE):
+            yield build_run_event(run, request, host)
+        common_events = CommonEvent.objects.filter(convention_event_id=event_id).order_by('date', 'id')
+        for common_event in common_events.iterator(chunk_size=CHUNK_SIZE):
+            yield build_event(
+                f'common-event-{common_event.pk}@{host}', common_event.date, common_event.duration,
+                common_event.name, common_event.updated_at,
+                description=common_event.description, url=schedule_url,
+            )
+
+    return calendar_response(
+        request, stats, f'convention-event-{event_id}.ics',
+        lambda: stream_calendar(stats['convention__name'], events()),
+    )
+
+
+@require_safe
+def user_calendar(request, token):
+    """Прогоны, на которые зарегистрирован пользователь (кроме отменённых регистраций)"""
+    try:
+        user_id = int(signing.Signer(salt=USER_TOKEN_SALT).unsign(token))
+    except (signing.BadSignature, ValueError):
+        raise Http404
+
+    since = timezone.now() - timedelta(days=PAST_DAYS)
+    registrations = Registration.objects.filter(
+        status__in=REGISTRATION_EVENT_STATUSES, run__date__gte=since
+    )
+    aggregates = {f'runs_{name}': aggregate for name, aggregate in run_stats('run__').items()}
+    stats = get_user_model().objects.filter(pk=user_id, is_active=True).annotate(**related_stats(
+        'registrations', registrations, 'user', count=Count('id'), updated=Max('updated_at'), **aggregates,
+    )).values(
+        'registrations_count', 'registrations_updated', *(f'registrations_{name}' for name in aggregates),
+    ).first()
+    if stats is None:
+        raise Http404
+    stats['location_log'] = get_location_log_id(
+        Run.objects.filter(pk__in=registrations.filter(user_id=user_id).values('run_id'))
+    )
+
+    host = request.get_host()
+
+    def events():
+        user_registrations = registrations.filter(user_id=user_id).select_related(
+            'run__game', 'run__city', 'run__convention_event__convention'
+        ).prefetch_related('run__rooms__venue').order_by('run__date', 'id')
+        for registration in user_registrations.iterator(chunk_size=CHUNK_SIZE):
+            yield build_run_event(
+                registration.run, request, host, status=REGISTRATION_EVENT_STATUSES[registration.status]
+            )
+
+    return calendar_response(
+        request, stats, 'my-runs.ics', lambda: stream_calendar('Мои игры', events()), private=True
+    )
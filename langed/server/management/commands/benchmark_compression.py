@@ -0,0 +1,81 @@
+"""
+Бенчмарк сжатия ответов API: время процессора на сжатие против сэкономленных байт
+для gzip и brotli на разных уровнях, на реальных ответах /api/runs/ и
+/api/convention-events/ для текущей базы. Ответы собираются в обход общего
+кэша ответов: из кэша приходит уже готовый HttpResponse без render().
+"""
+import gzip
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory
+
+from server import compression
+from server.views import ConventionEventViewSet, RunViewSet
+
+ENDPOINTS = (
+    ('/api/runs/', RunViewSet),
+    ('/api/convention-events/', ConventionEventViewSet),
+)
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает время и степень сжатия gzip/brotli на ответах API'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Количество повторов (по умолчанию 20)',
+        )
+
+    def handle(self, *args, **options):
+        hosts = [host for host in settings.ALLOWED_HOSTS if host and '*' not in host]
+        factory = APIRequestFactory(HTTP_HOST=hosts[0].lstrip('.') if hosts else 'localhost')
+
+        codecs = [(f'gzip -{level}', lambda content, level=level: gzip.compress(content, level, mtime=0))
+                  for level in (1, compression.GZIP_LEVEL, compression.PRECOMPRESS_GZIP_LEVEL)]
+        if compression.brotli is not None:
+            codecs += [(f'br q{quality}', lambda content, quality=quality: compression.brotli.compress(content, quality=quality))
+                       for quality in (1, compression.BROTLI_QUALITY, compression.PRECOMPRESS_BROTLI_QUALITY, 11)]
+        else:
+            self.stdout.write(self.style.WARNING('Brotli не установлен, сравнивается только gzip'))
+
+        for path, viewset in ENDPOINTS:
+            request = factory.get(path)
+            request.user = AnonymousUser()
+            with override_settings(RESPONSE_CACHE_ALIAS=None):
+                response = viewset.as_view({'get': 'list'})(request)
+                response.render()
+            content = response.content
+            self.stdout.write(f'{path}: {len(content)} байт')
+
+            for name, codec in codecs:
+                elapsed = self.measure(lambda: codec(content), options['repeat'])
+                size = len(codec(content))
+                saved = len(content) - size
+                self.stdout.write(
+                    f'  {name:<10} {elapsed * 1000:8.2f} мс, {size:8d} байт '
+                    f'({size / len(content):6.1%}), сэкономлено {saved / 1024:7.1f} КБ, '
+                    f'{saved / 1024 / elapsed / 1000 if elapsed else 0:7.1f} КБ на мс процессора'
+                )
+            self.stdout.write('')
+
+        self.stdout.write(
+            f'На лету: gzip -{compression.GZIP_LEVEL}, br q{compression.BROTLI_QUALITY}; '
+            f'для кэша: gzip -{compression.PRECOMPRESS_GZIP_LEVEL}, br q{compression.PRECOMPRESS_BROTLI_QUALITY} '
+            f'(сжимается один раз при записи, при попадании в кэш — 0 мс)'
+        )
+
+    def measure(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings)
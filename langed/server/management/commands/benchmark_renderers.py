@@ -0,0 +1,76 @@
+"""
+Микробенчмарк рендереров и парсеров API на реальном выводе RunSerializer
+(список /api/runs/ на текущей базе). Список собирается в обход общего кэша
+ответов: из кэша приходит уже готовый HttpResponse без data.
+"""
+import io
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from server.parsers import FastJSONParser, MessagePackParser
+from server.renderers import ColumnarJSONRenderer, FastJSONRenderer, MessagePackRenderer, msgpack, orjson
+from server.views import RunViewSet
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает скорость рендереров и парсеров API на выводе RunSerializer'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=50,
+            help='Количество повторов (по умолчанию 50)',
+        )
+        parser.add_argument(
+            '--time',
+            default='all',
+            help='Фильтр прогонов по времени: upcoming, past или all (по умолчанию all)',
+        )
+
+    def handle(self, *args, **options):
+        params = {} if options['time'] == 'all' else {'time': options['time']}
+        hosts = [host for host in settings.ALLOWED_HOSTS if host and '*' not in host]
+        factory = APIRequestFactory(HTTP_HOST=hosts[0].lstrip('.') if hosts else 'localhost')
+        request = factory.get('/api/runs/', params)
+        request.user = AnonymousUser()
+        with override_settings(RESPONSE_CACHE_ALIAS=None):
+            data = RunViewSet.as_view({'get': 'list'})(request).data
+        self.stdout.write(f'Прогонов: {len(data)}, orjson: {"да" if orjson else "нет"}, msgpack: {"да" if msgpack else "нет"}')
+
+        renderers = [('JSONRenderer (json)', JSONRenderer(), JSONParser())]
+        if orjson is not None:
+            renderers.append(('FastJSONRenderer', FastJSONRenderer(), FastJSONParser()))
+        renderers.append(('ColumnarJSONRenderer', ColumnarJSONRenderer(), None))
+        if msgpack is not None:
+            renderers.append(('MessagePackRenderer', MessagePackRenderer(), MessagePackParser()))
+
+        baseline = None
+        for name, renderer, parser in renderers:
+            render_time = self.measure(lambda: renderer.render(data, renderer.media_type, {}), options['repeat'])
+            content = renderer.render(data, renderer.media_type, {})
+            line = f'  {name:<22} render {render_time * 1000:7.2f} мс, {len(content):8d} байт'
+            if parser is not None:
+                parse_time = self.measure(lambda: parser.parse(io.BytesIO(content), parser.media_type, {}), options['repeat'])
+                line += f', parse {parse_time * 1000:7.2f} мс'
+            if baseline is None:
+                baseline = render_time
+            elif render_time:
+                line += f', render быстрее в {baseline / render_time:.1f} раза'
+            self.stdout.write(line)
+
+    def measure(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings)
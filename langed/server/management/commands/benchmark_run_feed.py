@@ -0,0 +1,106 @@
+"""
+Команда для сравнения ленты прогонов афиши (/api/runs/feed/) со списком
+прогонов через RunSerializer (/api/runs/) на текущей базе.
+Запросы выполняются анонимно, как у посетителей афиши, в обход общего
+кэша ответов (иначе замерялись бы попадания в кэш, а не сборка ответа).
+"""
+import json
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIRequestFactory
+
+from server.views import RunViewSet
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает скорость ленты прогонов для афиши и списка прогонов через RunSerializer'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Количество повторов каждого запроса (по умолчанию 20)',
+        )
+        parser.add_argument(
+            '--time',
+            default='upcoming',
+            help='Фильтр по времени: upcoming, past или all (по умолчанию upcoming)',
+        )
+        parser.add_argument(
+            '--city',
+            help='Фильтр по названию города',
+        )
+
+    def handle(self, *args, **options):
+        params = {}
+        if options['time'] != 'all':
+            params['time'] = options['time']
+        if options['city']:
+            params['city'] = options['city']
+
+        hosts = [host for host in settings.ALLOWED_HOSTS if host and '*' not in host]
+        factory = APIRequestFactory(HTTP_HOST=hosts[0].lstrip('.') if hosts else 'localhost')
+
+        endpoints = [
+            ('RunSerializer', RunViewSet.as_view({'get': 'list'}), '/api/runs/'),
+            ('feed', RunViewSet.as_view({'get': 'feed'}), '/api/runs/feed/'),
+        ]
+
+        results = {}
+        with override_settings(RESPONSE_CACHE_ALIAS=None):
+            for name, view, path in endpoints:
+                timings = []
+                for _ in range(options['repeat']):
+                    request = factory.get(path, params, HTTP_ACCEPT='application/json')
+                    request.user = AnonymousUser()
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        response = view(request)
+                        if hasattr(response, 'render'):
+                            response.render()
+                        timings.append(time.perf_counter() - started)
+                # Данные берём из тела ответа: от способа его сборки они не зависят
+                data = json.loads(response.content)
+                results[name] = {
+                    'median': statistics.median(timings),
+                    'queries': len(queries),
+                    'size': len(response.content),
+                    'data': data,
+                }
+                self.stdout.write(
+                    f'  {name:<14} {results[name]["median"] * 1000:8.2f} мс (медиана), '
+                    f'{len(queries)} запросов, {len(response.content)} байт, {len(data)} прогонов'
+                )
+
+        full, feed = results['RunSerializer'], results['feed']
+        if feed['median']:
+            self.stdout.write(self.style.SUCCESS(f'Ускорение: в {full["median"] / feed["median"]:.1f} раза'))
+
+        mismatches = self.compare(full['data'], feed['data'])
+        if mismatches:
+            self.stdout.write(self.style.WARNING(f'Расхождения с RunSerializer: {len(mismatches)}'))
+            for mismatch in mismatches[:10]:
+                self.stdout.write(f'  {mismatch}')
+        else:
+            self.stdout.write(self.style.SUCCESS('Данные ленты совпадают с RunSerializer'))
+
+    def compare(self, full, feed):
+        """Сравнивает поля ленты с соответствующими полями RunSerializer"""
+        if len(full) != len(feed):
+            return [f'разное количество прогонов: {len(full)} и {len(feed)}']
+        mismatches = []
+        for full_run, feed_run in zip(full, feed):
+            for field, value in feed_run.items():
+                expected = full_run.get(field)
+                if field == 'game':
+                    expected = {key: expected.get(key) for key in value}
+                if expected != value:
+                    mismatches.append(f'прогон {feed_run["id"]}, поле {field}: {expected!r} != {value!r}')
+        return mismatches
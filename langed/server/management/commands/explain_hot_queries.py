@@ -0,0 +1,194 @@
+"""
+Отчёт EXPLAIN для частых запросов с индексами из миграции 0030_hot_filter_indexes и без них.
+
+Команда создаёт отдельную тестовую базу (как manage.py test; для PostgreSQL
+нужно право CREATEDB), заполняет её синтетическими данными реалистичного
+размера с фиксированным seed, выполняет ANALYZE и для каждого запроса
+выводит план и медианное время выполнения — сначала с индексами, затем
+после их удаления. Рабочая база не затрагивается, тестовая удаляется в конце.
+
+    python manage.py explain_hot_queries --runs 20000 --registrations-per-run 12
+"""
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from server.models import (
+    ACTIVE_REGISTRATION_STATUSES, City, Convention, ConventionEvent, ConventionEventRegistration, Game,
+    Registration, Run,
+)
+
+# Индексы миграции 0030_hot_filter_indexes
+HOT_INDEXES = (
+    (Registration, 'registration_run_status'),
+    (Registration, 'registration_run_waitlist'),
+    (ConventionEventRegistration, 'event_registration_status'),
+    (ConventionEvent, 'convention_event_date_end'),
+    (Run, 'run_date'),
+)
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает планы частых запросов с новыми индексами и без них на синтетических данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=20000, help='Количество прогонов (по умолчанию 20000)')
+        parser.add_argument(
+            '--registrations-per-run',
+            type=int,
+            default=12,
+            help='Среднее количество регистраций на прогон (по умолчанию 12)',
+        )
+        parser.add_argument(
+            '--events',
+            type=int,
+            default=1000,
+            help='Количество проведений конвентов (по умолчанию 1000)',
+        )
+        parser.add_argument('--repeat', type=int, default=50, help='Повторов для замера времени (по умолчанию 50)')
+        parser.add_argument('--seed', type=int, default=1, help='Seed генератора данных (по умолчанию 1)')
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.seed(options)
+            self.analyze()
+            queries = self.get_queries()
+
+            with_indexes = {name: self.explain(queryset, options['repeat']) for name, queryset in queries}
+            self.drop_indexes()
+            self.analyze()
+            without_indexes = {name: self.explain(queryset, options['repeat']) for name, queryset in queries}
+
+            self.stdout.write(f'База: {connection.vendor}\n')
+            for name, queryset in queries:
+                self.report(name, queryset, without_indexes[name], with_indexes[name])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self, options):
+        """Синтетические данные: распределения похожи на рабочую базу, seed фиксирован"""
+        rng = random.Random(options['seed'])
+        per_run = options['registrations_per_run']
+        now = timezone.now()
+        today = date.today()
+
+        users = get_user_model().objects.bulk_create(
+            [get_user_model()(username=f'user{i}') for i in range(max(per_run * 4, 2000))],
+            batch_size=BATCH_SIZE,
+        )
+        cities = City.objects.bulk_create([City(name=f'Город {i}') for i in range(30)])
+        games = Game.objects.bulk_create(
+            [Game(name=f'Игра {i}', players_max=rng.randint(4, 30)) for i in range(max(options['runs'] // 10, 1))],
+            batch_size=BATCH_SIZE,
+        )
+        conventions = Convention.objects.bulk_create([Convention(name=f'Конвент {i}') for i in range(100)])
+
+        events = []
+        for _ in range(options['events']):
+            start = today + timedelta(days=rng.randint(-1500, 180))
+            events.append(ConventionEvent(
+                convention=rng.choice(conventions), city=rng.choice(cities),
+                date_start=start, date_end=start + timedelta(days=rng.randint(0, 3)),
+            ))
+        events = ConventionEvent.objects.bulk_create(events, batch_size=BATCH_SIZE)
+
+        # Большая часть прогонов в прошлом: история афиши копится годами
+        runs = Run.objects.bulk_create([
+            Run(
+                game=rng.choice(games), city=rng.choice(cities),
+                date=now + timedelta(hours=rng.randint(-24 * 1500, 24 * 180)),
+                convention_event=rng.choice(events) if rng.random() < 0.3 else None,
+            )
+            for _ in range(options['runs'])
+        ], batch_size=BATCH_SIZE)
+
+        statuses = ['confirmed'] * 6 + ['pending'] * 2 + ['cancelled'] + ['waitlist']
+        registrations = []
+        for run in runs:
+            for user in rng.sample(users, rng.randint(0, per_run * 2)):
+                registrations.append(Registration(
+                    run=run, user=user, status=rng.choice(statuses), is_technician=rng.random() < 0.1,
+                ))
+            if len(registrations) >= BATCH_SIZE:
+                Registration.objects.bulk_create(registrations)
+                registrations = []
+        Registration.objects.bulk_create(registrations)
+
+        event_registrations = []
+        for event in events:
+            for user in rng.sample(users, rng.randint(0, 60)):
+                event_registrations.append(ConventionEventRegistration(
+                    convention_event=event, user=user, status=rng.choice(['confirmed', 'confirmed', 'pending', 'cancelled']),
+                ))
+        ConventionEventRegistration.objects.bulk_create(event_registrations, batch_size=BATCH_SIZE)
+
+        self.sample_run_id = rng.choice(runs).pk
+        self.sample_event_id = rng.choice(events).pk
+        self.stdout.write(
+            f'Данные: {len(runs)} прогонов, {Registration.objects.count()} регистраций, '
+            f'{len(events)} проведений, {len(event_registrations)} регистраций на конвенты\n'
+        )
+
+    def get_queries(self):
+        """Частые запросы из views.py и счётчиков регистраций"""
+        run_id, event_id = self.sample_run_id, self.sample_event_id
+        return [
+            ('Счётчик игроков прогона', Registration.objects.filter(
+                run_id=run_id, status__in=ACTIVE_REGISTRATION_STATUSES, is_technician=False,
+            ).order_by().values('run_id')),
+            ('Первый в листе ожидания (unregister)', Registration.objects.filter(
+                run_id=run_id, status='waitlist', is_technician=False,
+            ).order_by('created_at')[:1]),
+            ('Подтверждённые регистрации на проведение', ConventionEventRegistration.objects.filter(
+                convention_event_id=event_id, status='confirmed',
+            ).order_by().values('id')),
+            ('Предстоящие проведения (?time=upcoming)', ConventionEvent.objects.filter(
+                date_end__gte=date.today(),
+            ).order_by('date_start')),
+            ('Ближайшие прогоны (?time=upcoming, первая страница)', Run.objects.filter(
+                date__gte=timezone.now(),
+            ).order_by('date')[:50]),
+        ]
+
+    def analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def drop_indexes(self):
+        with connection.cursor() as cursor:
+            for _, name in HOT_INDEXES:
+                cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+
+    def explain(self, queryset, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(queryset.all())
+            timings.append(time.perf_counter() - started)
+        return queryset.explain(), statistics.median(timings)
+
+    def report(self, name, queryset, before, after):
+        (plan_before, time_before), (plan_after, time_after) = before, after
+        self.stdout.write(self.style.MIGRATE_HEADING(name))
+        self.stdout.write(str(queryset.query))
+        self.stdout.write('  Без индексов:')
+        self.stdout.write(self.indent(plan_before))
+        self.stdout.write('  С индексами:')
+        self.stdout.write(self.indent(plan_after))
+        speedup = time_before / time_after if time_after else 0
+        self.stdout.write(
+            f'  Время: {time_before * 1000:.3f} мс → {time_after * 1000:.3f} мс (x{speedup:.1f})\n'
+        )
+
+    def indent(self, plan):
+        return '\n'.join(f'    {line}' for line in plan.splitlines())
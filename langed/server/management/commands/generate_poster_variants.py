@@ -0,0 +1,54 @@
+"""
+Команда для создания копий постеров игр (server/posters.py), загруженных
+до появления копий или после изменения набора размеров.
+
+По умолчанию обрабатываются только игры с постером без копий;
+с --all копии пересоздаются для всех постеров.
+"""
+
+from django.core.management.base import BaseCommand
+
+from server.models import Game
+from server.posters import process_game_poster
+
+
+class Command(BaseCommand):
+    help = 'Создаёт уменьшенные копии и заглушки постеров игр'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересоздать копии для всех постеров, а не только для необработанных',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Показать игры, которые будут обработаны, не создавая копий',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options.get('dry_run', False)
+
+        games = Game.objects.exclude(poster='').exclude(poster__isnull=True).order_by('pk')
+        if not options.get('all'):
+            games = games.filter(poster_variants={})
+
+        processed = failed = 0
+        for game in games.only('id', 'name', 'poster', 'poster_variants').iterator():
+            if dry_run:
+                self.stdout.write(f'  {game} (id={game.pk}): {game.poster.name}')
+                processed += 1
+                continue
+            process_game_poster(game)
+            if game.poster_variants:
+                processed += 1
+                self.stdout.write(f'  {game} (id={game.pk}): {len(game.poster_variants["webp"])} размер(ов)')
+            else:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f'  {game} (id={game.pk}): не удалось обработать {game.poster.name}'))
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f'Будет обработано постеров: {processed} (--dry-run)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Обработано постеров: {processed}, с ошибками: {failed}'))
@@ -0,0 +1,20 @@
+"""
+Команда для сверки счётчиков регистраций проведений конвентов
+(confirmed_registrations_count, pending_registrations_count) с таблицей
+регистраций и исправления расхождений.
+"""
+
+from server.models import CONVENTION_EVENT_REGISTRATION_COUNTERS, ConventionEvent
+
+from .reconcile_run_counters import Command as ReconcileRunCountersCommand
+
+
+class Command(ReconcileRunCountersCommand):
+    help = 'Сверяет счётчики регистраций проведений конвентов с регистрациями и исправляет расхождения'
+
+    model = ConventionEvent
+    counters = CONVENTION_EVENT_REGISTRATION_COUNTERS
+    label = 'проведений'
+
+    def get_queryset(self):
+        return self.model.objects.select_related('convention', 'city')
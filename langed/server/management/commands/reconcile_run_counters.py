@@ -0,0 +1,64 @@
+"""
+Команда для сверки счётчиков регистраций прогонов (players_count, technicians_count,
+waitlist_count, confirmed_count) с таблицей регистраций и исправления расхождений.
+
+Счётчики могут разойтись, если регистрации менялись в обход save()
+(queryset.update(), правка базы вручную).
+"""
+
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+
+from server.models import RUN_REGISTRATION_COUNTERS, Run
+
+
+class Command(BaseCommand):
+    help = 'Сверяет счётчики регистраций прогонов с регистрациями и исправляет расхождения'
+
+    # Модель со счётчиками, её счётчики и подпись во множественном числе для итогов
+    model = Run
+    counters = RUN_REGISTRATION_COUNTERS
+    label = 'прогонов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Показать расхождения, не внося изменений',
+        )
+
+    def get_queryset(self):
+        return self.model.objects.select_related('game', 'city')
+
+    def handle(self, *args, **options):
+        dry_run = options.get('dry_run', False)
+
+        drifted = Q()
+        for name in self.counters:
+            drifted |= ~Q(**{name: F(f'actual_{name}')})
+
+        objects = self.get_queryset().with_actual_registration_counts().filter(drifted).order_by('pk')
+
+        fixed_count = 0
+        for obj in objects:
+            differences = ', '.join(
+                f'{name}: {getattr(obj, name)} → {getattr(obj, f"actual_{name}")}'
+                for name in self.counters
+                if getattr(obj, name) != getattr(obj, f'actual_{name}')
+            )
+            if dry_run:
+                self.stdout.write(f'  [DRY RUN] #{obj.pk} {obj}: {differences}')
+            else:
+                # Пересчитываем в самом UPDATE, чтобы не затереть изменения,
+                # сделанные после чтения
+                self.model.objects.filter(pk=obj.pk).with_actual_registration_counts().update(**{
+                    name: F(f'actual_{name}') for name in self.counters
+                })
+                self.stdout.write(self.style.SUCCESS(f'  ✓ #{obj.pk} {obj}: {differences}'))
+            fixed_count += 1
+
+        self.stdout.write('')
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f'DRY RUN: Расхождения в {fixed_count} {self.label}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Исправлено: {fixed_count} {self.label}'))
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:54
+
+from collections import defaultdict
+
+import django.contrib.postgres.search
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import Value
+
+SEARCH_INDEX = GinIndex(fields=['search_vector'], name='server_game_search_gin')
+
+
+def create_search_index(apps, schema_editor):
+    """GIN-индекс и заполнение поисковых векторов — только для PostgreSQL"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Game = apps.get_model('server', 'Game')
+    schema_editor.add_index(Game, SEARCH_INDEX)
+
+    names = defaultdict(list)
+    rows = Game.creators.through.objects.values_list(
+        'game_id', 'user__first_name', 'user__last_name', 'user__username'
+    )
+    for game_id, first_name, last_name, username in rows:
+        names[game_id].append(' '.join(part for part in (first_name, last_name, username) if part))
+
+    for game_id in Game.objects.values_list('id', flat=True):
+        Game.objects.filter(pk=game_id).update(search_vector=(
+            SearchVector('name', weight='A', config='russian') +
+            SearchVector(Value(' '.join(names[game_id])), weight='B', config='russian') +
+            SearchVector('announcement', weight='C', config='russian')
+        ))
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.remove_index(apps.get_model('server', 'Game'), SEARCH_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('server', '0023_change_registration_default_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
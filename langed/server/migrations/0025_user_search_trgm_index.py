@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:20
+
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db import migrations
+from django.db.models import TextField, Value
+from django.db.models.functions import Concat, Lower
+
+# Выражение совпадает с server.user_search.user_search_expression
+USER_SEARCH_INDEX = GinIndex(
+    OpClass(
+        Lower(Concat(
+            'username', Value(' '), 'first_name', Value(' '), 'last_name', Value(' '), 'email',
+            output_field=TextField(),
+        )),
+        name='gin_trgm_ops',
+    ),
+    name='auth_user_search_trgm',
+)
+
+
+def create_user_search_index(apps, schema_editor):
+    """Расширение pg_trgm и триграммный индекс для поиска пользователей — только для PostgreSQL"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.add_index(apps.get_model(settings.AUTH_USER_MODEL), USER_SEARCH_INDEX)
+
+
+def drop_user_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.remove_index(apps.get_model(settings.AUTH_USER_MODEL), USER_SEARCH_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('server', '0024_game_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_user_search_index, drop_user_search_index),
+    ]
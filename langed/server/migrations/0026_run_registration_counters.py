@@ -0,0 +1,58 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:59
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+ACTIVE_STATUSES = ['confirmed', 'pending']
+COUNTERS = {
+    'players_count': Q(status__in=ACTIVE_STATUSES, is_technician=False),
+    'technicians_count': Q(status__in=ACTIVE_STATUSES, is_technician=True),
+    'waitlist_count': Q(status='waitlist', is_technician=False),
+    'confirmed_count': Q(status='confirmed', is_technician=False),
+}
+
+
+def fill_counters(apps, schema_editor):
+    """Заполняет счётчики регистраций существующих прогонов одним UPDATE"""
+    Run = apps.get_model('server', 'Run')
+    Registration = apps.get_model('server', 'Registration')
+    Run.objects.update(**{
+        name: Coalesce(Subquery(
+            Registration.objects.filter(condition, run=OuterRef('pk')).order_by().values(
+                'run'
+            ).annotate(count=Count('pk')).values('count')
+        ), 0)
+        for name, condition in COUNTERS.items()
+    })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('server', '0025_user_search_trgm_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='run',
+            name='confirmed_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Подтверждённых игроков'),
+        ),
+        migrations.AddField(
+            model_name='run',
+            name='players_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Активные регистрации игроков (ожидают подтверждения и подтверждённые)', verbose_name='Игроков'),
+        ),
+        migrations.AddField(
+            model_name='run',
+            name='technicians_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Игротехников'),
+        ),
+        migrations.AddField(
+            model_name='run',
+            name='waitlist_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В листе ожидания'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
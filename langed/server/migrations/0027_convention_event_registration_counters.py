@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:01
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+COUNTERS = {
+    'confirmed_registrations_count': Q(status='confirmed'),
+    'pending_registrations_count': Q(status='pending'),
+}
+
+
+def fill_counters(apps, schema_editor):
+    """Заполняет счётчики регистраций существующих проведений одним UPDATE"""
+    ConventionEvent = apps.get_model('server', 'ConventionEvent')
+    ConventionEventRegistration = apps.get_model('server', 'ConventionEventRegistration')
+    ConventionEvent.objects.update(**{
+        name: Coalesce(Subquery(
+            ConventionEventRegistration.objects.filter(
+                condition, convention_event=OuterRef('pk')
+            ).order_by().values('convention_event').annotate(count=Count('pk')).values('count')
+        ), 0)
+        for name, condition in COUNTERS.items()
+    })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('server', '0026_run_registration_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conventionevent',
+            name='confirmed_registrations_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Подтверждённых регистраций'),
+        ),
+        migrations.AddField(
+            model_name='conventionevent',
+            name='pending_registrations_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Ожидающих регистраций'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('server', '0027_convention_event_registration_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='poster_placeholder',
+            field=models.TextField(blank=True, editable=False, verbose_name='Заглушка постера'),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='poster_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Копии постера'),
+        ),
+    ]
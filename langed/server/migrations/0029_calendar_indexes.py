@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('server', '0028_game_poster_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='conventionevent',
+            index=models.Index(fields=['city', 'date_start', 'date_end'], name='convention_event_city_dates'),
+        ),
+        migrations.AddIndex(
+            model_name='run',
+            index=models.Index(fields=['city', 'date'], name='run_city_date'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('server', '0029_calendar_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='conventionevent',
+            index=models.Index(fields=['date_end'], name='convention_event_date_end'),
+        ),
+        migrations.AddIndex(
+            model_name='conventioneventregistration',
+            index=models.Index(fields=['convention_event', 'status'], name='event_registration_status'),
+        ),
+        migrations.AddIndex(
+            model_name='registration',
+            index=models.Index(fields=['run', 'status', 'is_technician'], name='registration_run_status'),
+        ),
+        migrations.AddIndex(
+            model_name='registration',
+            index=models.Index(condition=models.Q(('is_technician', False), ('status', 'waitlist')), fields=['run', 'created_at'], name='registration_run_waitlist'),
+        ),
+        migrations.AddIndex(
+            model_name='run',
+            index=models.Index(fields=['date'], name='run_date'),
+        ),
+    ]
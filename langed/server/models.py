@@ -1,9 +1,125 @@
-from django.db import models
+from collections import Counter
+
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from auditlog.registry import auditlog
 
 
+# Статусы регистрации на прогон, которые занимают место
+ACTIVE_REGISTRATION_STATUSES = ['confirmed', 'pending']
+
+# Счётчики регистраций, которые хранятся в полях прогона, и условия их подсчёта
+RUN_REGISTRATION_COUNTERS = {
+    'players_count': Q(status__in=ACTIVE_REGISTRATION_STATUSES, is_technician=False),
+    'technicians_count': Q(status__in=ACTIVE_REGISTRATION_STATUSES, is_technician=True),
+    'waitlist_count': Q(status='waitlist', is_technician=False),
+    'confirmed_count': Q(status='confirmed', is_technician=False),
+}
+
+
+def get_registration_counters(status, is_technician):
+    """Счётчики прогона, в которые входит регистрация с таким статусом (см. RUN_REGISTRATION_COUNTERS)"""
+    if is_technician:
+        return ['technicians_count'] if status in ACTIVE_REGISTRATION_STATUSES else []
+    counters = []
+    if status in ACTIVE_REGISTRATION_STATUSES:
+        counters.append('players_count')
+    if status == 'confirmed':
+        counters.append('confirmed_count')
+    if status == 'waitlist':
+        counters.append('waitlist_count')
+    return counters
+
+
+# Счётчики регистраций, которые хранятся в полях проведения конвента
+CONVENTION_EVENT_REGISTRATION_COUNTERS = {
+    'confirmed_registrations_count': Q(status='confirmed'),
+    'pending_registrations_count': Q(status='pending'),
+}
+
+
+def get_event_registration_counters(status):
+    """Счётчики проведения, в которые входит регистрация с таким статусом"""
+    return [
+        name for name, counted_status in (
+            ('confirmed_registrations_count', 'confirmed'),
+            ('pending_registrations_count', 'pending'),
+        )
+        if status == counted_status
+    ]
+
+
+def get_counter_changes(previous, current, get_counters):
+    """
+    Изменения счётчиков {(id владельца, поле): приращение} при переходе регистрации
+    из состояния previous в current. Состояние — кортеж (id владельца, *поля статуса);
+    None для новой или удалённой регистрации.
+    """
+    changes = Counter()
+    if previous:
+        for field in get_counters(*previous[1:]):
+            changes[previous[0], field] -= 1
+    if current:
+        for field in get_counters(*current[1:]):
+            changes[current[0], field] += 1
+    return changes
+
+
+def update_counters(model, changes):
+    """
+    Применяет изменения счётчиков {(pk, поле): приращение} через F(),
+    одним UPDATE на строку. Вызывается внутри транзакции изменения регистрации.
+    """
+    by_pk = {}
+    for (pk, field), delta in changes.items():
+        if delta:
+            by_pk.setdefault(pk, {})[field] = F(field) + delta
+    for pk, updates in by_pk.items():
+        model.objects.filter(pk=pk).update(**updates)
+
+
+def count_registrations(registrations, relation, counters):
+    """
+    Выражения {'actual_<счётчик>': число регистраций} для аннотации владельца,
+    посчитанные по таблице регистраций, — для сверки с полями-счётчиками.
+    """
+    return {
+        f'actual_{name}': Coalesce(Subquery(
+            registrations.filter(condition, **{relation: OuterRef('pk')}).order_by().values(
+                relation
+            ).annotate(count=Count('pk')).values('count')
+        ), 0)
+        for name, condition in counters.items()
+    }
+
+
+def get_saved_state(instance, previous, fields, update_fields):
+    """
+    Состояние регистрации в базе после save(): поля, не вошедшие в update_fields,
+    остались прежними. fields — имена полей состояния в порядке кортежа.
+    """
+    current = tuple(getattr(instance, field) for field in fields)
+    if previous is None or update_fields is None:
+        return current
+    saved = set(update_fields)
+    return tuple(
+        value if field in saved or field.removesuffix('_id') in saved else old
+        for field, value, old in zip(fields, current, previous)
+    )
+
+
+def get_update_fields_without_counters(instance, counters):
+    """Поля для save() владельца без счётчиков: они меняются только через F()"""
+    return [
+        field.name for field in instance._meta.concrete_fields
+        if not field.primary_key and field.name not in counters
+    ]
+
+
 class Region(models.Model):
     """Модель региона"""
     
@@ -78,6 +194,9 @@ class Game(models.Model):
         null=True,
         verbose_name='Постер'
     )
+    # Уменьшенные копии постера и заглушка (server/posters.py), обновляются сигналом при загрузке
+    poster_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name='Копии постера')
+    poster_placeholder = models.TextField(blank=True, editable=False, verbose_name='Заглушка постера')
     announcement = models.TextField(blank=True, verbose_name='Анонс')
     red_flags = models.TextField(blank=True, verbose_name='Красные флаги')
     
@@ -92,6 +211,9 @@ class Game(models.Model):
     
     technicians = models.PositiveIntegerField(default=0, verbose_name='Игротехники')
     
+    # Поисковый вектор для PostgreSQL (GIN-индекс создаётся миграцией), обновляется в search.py
+    search_vector = SearchVectorField(null=True, editable=False)
+    
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
 
@@ -184,6 +306,17 @@ class ConventionLink(models.Model):
         return self.title if self.title else self.get_link_type_display()
 
 
+class ConventionEventQuerySet(models.QuerySet):
+    """QuerySet проведений с пересчётом счётчиков регистраций"""
+
+    def with_actual_registration_counts(self):
+        """Аннотирует проведения счётчиками, посчитанными по регистрациям (actual_confirmed_registrations_count и т.д.)"""
+        return self.annotate(**count_registrations(
+            ConventionEventRegistration.objects.all(), 'convention_event',
+            CONVENTION_EVENT_REGISTRATION_COUNTERS
+        ))
+
+
 class ConventionEvent(models.Model):
     """Модель проведения конвента"""
     
@@ -228,28 +361,58 @@ class ConventionEvent(models.Model):
         verbose_name='Регистрация открыта'
     )
     
+    # Счётчики регистраций обновляются вместе с регистрациями (ConventionEventRegistration.save,
+    # сигнал post_delete); расхождения исправляет команда reconcile_convention_event_counters
+    confirmed_registrations_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Подтверждённых регистраций'
+    )
+    pending_registrations_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Ожидающих регистраций'
+    )
+    
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
 
+    objects = ConventionEventQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Проведение конвента'
         verbose_name_plural = 'Проведения конвентов'
         ordering = ['date_start']
+        indexes = [
+            # Календарь и фильтр ?from=&to=&city_id= (date_range.py)
+            models.Index(fields=['city', 'date_start', 'date_end'], name='convention_event_city_dates'),
+            # ?time=upcoming|past без города
+            models.Index(fields=['date_end'], name='convention_event_date_end'),
+        ]
 
     def __str__(self):
         return f'{self.convention.name} — {self.city.name} ({self.date_start.strftime("%d.%m.%Y")} - {self.date_end.strftime("%d.%m.%Y")})'
 
+    def save(self, *args, **kwargs):
+        # Счётчики регистраций меняются только через F(); при сохранении проведения
+        # (в том числе из админки) не перезаписываем их значениями, прочитанными раньше
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = get_update_fields_without_counters(
+                self, CONVENTION_EVENT_REGISTRATION_COUNTERS
+            )
+        super().save(*args, **kwargs)
+
     def clean(self):
         if self.date_start > self.date_end:
             raise ValidationError('Дата начала не может быть позже даты окончания')
     
     def get_confirmed_registrations_count(self):
         """Возвращает количество подтверждённых регистраций"""
-        return self.event_registrations.filter(status='confirmed').count()
+        return self.confirmed_registrations_count
     
     def get_pending_registrations_count(self):
         """Возвращает количество ожидающих регистраций"""
-        return self.event_registrations.filter(status='pending').count()
+        return self.pending_registrations_count
     
     def get_available_slots(self):
         """Возвращает количество свободных мест (None если без ограничений)"""
@@ -320,6 +483,16 @@ class Room(models.Model):
         return f'{self.name}{blackbox_mark} — {self.venue.name}'
 
 
+class RunQuerySet(models.QuerySet):
+    """QuerySet прогонов с пересчётом счётчиков регистраций"""
+
+    def with_actual_registration_counts(self):
+        """Аннотирует прогоны счётчиками, посчитанными по регистрациям (actual_players_count и т.д.)"""
+        return self.annotate(**count_registrations(
+            Registration.objects.all(), 'run', RUN_REGISTRATION_COUNTERS
+        ))
+
+
 class Run(models.Model):
     """Модель прогона (сеанс игры)"""
     
@@ -372,17 +545,56 @@ class Run(models.Model):
         verbose_name='Регистрация открыта'
     )
     
+    # Счётчики регистраций обновляются вместе с регистрациями (Registration.save,
+    # сигнал post_delete); расхождения исправляет команда reconcile_run_counters
+    players_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Игроков',
+        help_text='Активные регистрации игроков (ожидают подтверждения и подтверждённые)'
+    )
+    technicians_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Игротехников'
+    )
+    waitlist_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В листе ожидания'
+    )
+    confirmed_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Подтверждённых игроков'
+    )
+    
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
 
+    objects = RunQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Прогон'
         verbose_name_plural = 'Прогоны'
         ordering = ['date']
+        indexes = [
+            # Календарь и фильтр ?from=&to=&city_id= (date_range.py)
+            models.Index(fields=['city', 'date'], name='run_city_date'),
+            # ?time=upcoming|past и сортировка по дате без города
+            models.Index(fields=['date'], name='run_date'),
+        ]
 
     def __str__(self):
         return f'{self.game.name} — {self.city.name} ({self.date.strftime("%d.%m.%Y %H:%M")})'
     
+    def save(self, *args, **kwargs):
+        # Счётчики регистраций меняются только через F(); при сохранении прогона
+        # не перезаписываем их значениями, прочитанными раньше
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = get_update_fields_without_counters(self, RUN_REGISTRATION_COUNTERS)
+        super().save(*args, **kwargs)
+    
     def clean(self):
         # Проверяем, что дата прогона попадает в даты проведения конвента
         if self.convention_event and self.date:
@@ -402,10 +614,15 @@ class Run(models.Model):
     
     def get_registered_count(self):
         """Возвращает количество зарегистрированных игроков"""
-        return self.registrations.filter(
-            status__in=['confirmed', 'pending'],
-            is_technician=False
-        ).count()
+        return self.players_count
+    
+    def get_technicians_count(self):
+        """Возвращает количество зарегистрированных игротехников"""
+        return self.technicians_count
+    
+    def get_waitlist_count(self):
+        """Возвращает количество игроков в листе ожидания"""
+        return self.waitlist_count
     
     def get_available_slots(self):
         """Возвращает количество свободных мест"""
@@ -520,11 +737,36 @@ class Registration(models.Model):
         verbose_name_plural = 'Регистрации'
         ordering = ['created_at']
         unique_together = ['run', 'user']
+        indexes = [
+            # Счётчики регистраций прогона (RUN_REGISTRATION_COUNTERS) и списки по статусу
+            models.Index(fields=['run', 'status', 'is_technician'], name='registration_run_status'),
+            # Первый в листе ожидания при освобождении места (RunViewSet.unregister);
+            # частичный индекс: строк листа ожидания мало по сравнению со всеми регистрациями
+            models.Index(
+                fields=['run', 'created_at'],
+                condition=Q(status='waitlist', is_technician=False),
+                name='registration_run_waitlist',
+            ),
+        ]
 
     def __str__(self):
         role_info = ' (игротехник)' if self.is_technician else ''
         return f'{self.user.username} → {self.run.game.name}{role_info}'
     
+    def save(self, *args, **kwargs):
+        """Сохраняет регистрацию и в той же транзакции обновляет счётчики прогона"""
+        with transaction.atomic():
+            previous = None
+            if not self._state.adding:
+                previous = Registration.objects.select_for_update().filter(pk=self.pk).values_list(
+                    'run_id', 'status', 'is_technician'
+                ).first()
+            super().save(*args, **kwargs)
+            current = get_saved_state(
+                self, previous, ('run_id', 'status', 'is_technician'), kwargs.get('update_fields')
+            )
+            update_counters(Run, get_counter_changes(previous, current, get_registration_counters))
+    
     def clean(self):
         # Проверяем, что пользователь не является мастером этого прогона
         if hasattr(self, 'run') and hasattr(self, 'user'):
@@ -591,21 +833,45 @@ class ConventionEventRegistration(models.Model):
         verbose_name_plural = 'Регистрации на конвент'
         ordering = ['created_at']
         unique_together = ['convention_event', 'user']
+        indexes = [
+            # Счётчики регистраций проведения (CONVENTION_EVENT_REGISTRATION_COUNTERS)
+            models.Index(fields=['convention_event', 'status'], name='event_registration_status'),
+        ]
 
     def __str__(self):
         return f'{self.user.username} → {self.convention_event.convention.name} ({self.get_status_display()})'
 
+    def save(self, *args, **kwargs):
+        """Сохраняет регистрацию и в той же транзакции обновляет счётчики проведения"""
+        with transaction.atomic():
+            previous = None
+            if not self._state.adding:
+                previous = ConventionEventRegistration.objects.select_for_update().filter(
+                    pk=self.pk
+                ).values_list('convention_event_id', 'status').first()
+            super().save(*args, **kwargs)
+            current = get_saved_state(
+                self, previous, ('convention_event_id', 'status'), kwargs.get('update_fields')
+            )
+            update_counters(
+                ConventionEvent, get_counter_changes(previous, current, get_event_registration_counters)
+            )
+
 
 # Регистрация моделей для аудита (логирование изменений)
 auditlog.register(Region)
 auditlog.register(City)
-auditlog.register(Game, m2m_fields={'creators'})
+auditlog.register(
+    Game, m2m_fields={'creators'}, exclude_fields=['search_vector', 'poster_variants', 'poster_placeholder']
+)
 auditlog.register(Convention, m2m_fields={'organizers'})
 auditlog.register(ConventionLink)
-auditlog.register(ConventionEvent, m2m_fields={'organizers'})
+auditlog.register(
+    ConventionEvent, m2m_fields={'organizers'}, exclude_fields=list(CONVENTION_EVENT_REGISTRATION_COUNTERS)
+)
 auditlog.register(Venue)
 auditlog.register(Room)
-auditlog.register(Run, m2m_fields={'masters', 'rooms'})
+auditlog.register(Run, m2m_fields={'masters', 'rooms'}, exclude_fields=list(RUN_REGISTRATION_COUNTERS))
 auditlog.register(CommonEvent)
 auditlog.register(Registration)
 auditlog.register(ConventionEventRegistration)
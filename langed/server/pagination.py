@@ -0,0 +1,122 @@
+"""
+Keyset-пагинация (по курсору) для списков API.
+
+Страница выбирается условием по паре (поле сортировки, id), поэтому стоимость
+запроса не растёт с номером страницы, в отличие от OFFSET.
+Пагинация включается только если в запросе передан `page_size` или `cursor`,
+без них список отдаётся целиком, как раньше.
+"""
+import base64
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Пагинация по ключу (keyset_field, id).
+
+    Поле ключа берётся из атрибута `keyset_field` view, направление —
+    из сортировки queryset (`date` или `-date`), поэтому пагинация
+    работает с существующими фильтрами time=upcoming|past.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 50
+    max_page_size = 200
+    invalid_cursor_message = 'Неверный курсор'
+
+    def is_enabled(self, request):
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_keyset_field(self, view):
+        return getattr(view, 'keyset_field', 'id')
+
+    def is_descending(self, queryset, field):
+        """Определяет направление сортировки по ключу из текущего order_by queryset"""
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        for item in ordering:
+            if isinstance(item, str) and item.lstrip('-') == field:
+                return item.startswith('-')
+        return False
+
+    def encode_cursor(self, value, pk):
+        raw = json.dumps([value.isoformat() if hasattr(value, 'isoformat') else value, pk])
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, request, field):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw_value, pk = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            return field.to_python(raw_value), int(pk)
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_enabled(request):
+            return None
+
+        self.request = request
+        self.page_size_value = self.get_page_size(request)
+        self.keyset_field = self.get_keyset_field(view)
+        model_field = queryset.model._meta.get_field(self.keyset_field)
+        descending = self.is_descending(queryset, self.keyset_field)
+        prefix = '-' if descending else ''
+        queryset = queryset.order_by(f'{prefix}{self.keyset_field}', f'{prefix}id')
+
+        cursor = self.decode_cursor(request, model_field)
+        if cursor is not None:
+            value, pk = cursor
+            lookup = 'lt' if descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{self.keyset_field}__{lookup}': value}) |
+                Q(**{self.keyset_field: value, f'id__{lookup}': pk})
+            )
+
+        # Берём на одну запись больше, чтобы узнать, есть ли следующая страница
+        page = list(queryset[:self.page_size_value + 1])
+        self.has_next = len(page) > self.page_size_value
+        self.page = page[:self.page_size_value]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        last = self.page[-1]
+        cursor = self.encode_cursor(getattr(last, self.keyset_field), last.pk)
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.page_size_query_param, self.page_size_value)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,92 @@
+"""
+Проверка прав на редактирование для полей can_edit.
+
+Вместо запроса `request.user in obj.<m2m>.all()` на каждый объект
+идентификаторы всех объектов, которыми управляет пользователь, загружаются
+одним запросом на весь запрос к API и проверяются по множествам в памяти.
+"""
+from django.db.models import CharField, F, Value
+
+from .models import Convention, ConventionEvent, Game, Run
+
+
+class EditPermissions:
+    """Права текущего пользователя на редактирование объектов"""
+
+    def __init__(self, user):
+        self.user = user
+        self._ids = None
+
+    @property
+    def is_authenticated(self):
+        return bool(self.user and self.user.is_authenticated)
+
+    @property
+    def is_staff(self):
+        return self.is_authenticated and self.user.is_staff
+
+    def _load(self):
+        """Загружает id прогонов, игр, проведений и конвентов пользователя одним запросом"""
+        if self._ids is not None:
+            return self._ids
+
+        self._ids = {'run': set(), 'game': set(), 'event': set(), 'convention': set()}
+        if not self.is_authenticated or self.is_staff:
+            return self._ids
+
+        def owned(through, kind, column):
+            return through.objects.filter(user_id=self.user.pk).annotate(
+                kind=Value(kind, output_field=CharField()),
+                object_id=F(column),
+            ).values_list('kind', 'object_id')
+
+        rows = owned(Run.masters.through, 'run', 'run_id').union(
+            owned(Game.creators.through, 'game', 'game_id'),
+            owned(ConventionEvent.organizers.through, 'event', 'conventionevent_id'),
+            owned(Convention.organizers.through, 'convention', 'convention_id'),
+            all=True,
+        )
+        for kind, object_id in rows:
+            self._ids[kind].add(object_id)
+        return self._ids
+
+    def owns(self, kind, object_id):
+        """Является ли пользователь владельцем объекта: kind — run, game, event или convention"""
+        if not self.is_authenticated:
+            return False
+        return self.is_staff or object_id in self._load()[kind]
+
+    def can_edit_game(self, game):
+        return self.owns('game', game.pk)
+
+    def can_edit_convention(self, convention):
+        return self.owns('convention', convention.pk)
+
+    def can_edit_convention_event(self, event):
+        """Организатор проведения или организатор конвента"""
+        return self.owns('event', event.pk) or self.owns('convention', event.convention_id)
+
+    def is_run_master(self, run):
+        return self.owns('run', run.pk)
+
+    def can_edit_scheduled_run(self, run):
+        """Мастер прогона или организатор проведения/конвента, к которому привязан прогон"""
+        if self.is_run_master(run):
+            return True
+        if run.convention_event_id is None or not self.is_authenticated:
+            return False
+        if self.owns('event', run.convention_event_id):
+            return True
+        return bool(self._load()['convention']) and self.owns('convention', run.convention_event.convention_id)
+
+
+def get_edit_permissions(context):
+    """Возвращает EditPermissions, общий для всех сериализаторов в рамках одного запроса"""
+    request = context.get('request')
+    if request is None:
+        return EditPermissions(None)
+    permissions = getattr(request, '_edit_permissions', None)
+    if permissions is None:
+        permissions = EditPermissions(request.user)
+        request._edit_permissions = permissions
+    return permissions
@@ -0,0 +1,147 @@
+"""
+Производные изображения постеров игр.
+
+Оригинал постера часто — фотография на несколько мегабайт, а показывается
+он превью в каталоге. При загрузке постера (сигнал post_save игры) из него
+делаются уменьшенные копии нескольких ширин в WebP и JPEG и крошечная
+заглушка, которая встраивается в ответ API как data: URI и показывается,
+пока грузится картинка.
+
+Копии лежат рядом с оригиналом в том же хранилище:
+
+    games/posters/photo.jpg
+    games/posters/photo_320w.webp, games/posters/photo_320w.jpg, ...
+
+Пути к ним хранятся в Game.poster_variants:
+
+    {"width": 2000, "height": 3000,
+     "webp": {"320": "games/posters/photo_320w.webp", ...},
+     "jpeg": {"320": "games/posters/photo_320w.jpg", ...}}
+
+Копии шире оригинала не делаются. Если изображение не удалось открыть,
+poster_variants остаётся пустым, и клиент получает только оригинал.
+Для постеров, загруженных до появления копий, — команда generate_poster_variants.
+"""
+import base64
+import io
+import logging
+import os
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .models import Game
+
+logger = logging.getLogger(__name__)
+
+# Ширины копий в пикселях: превью в каталоге, карточка, модальное окно на широком экране
+POSTER_WIDTHS = (320, 640, 1280)
+
+# Формат → (расширение, параметры сохранения Pillow)
+POSTER_FORMATS = {
+    'webp': ('webp', {'format': 'WEBP', 'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+PLACEHOLDER_WIDTH = 16
+PLACEHOLDER_OPTIONS = {'format': 'WEBP', 'quality': 40}
+
+
+def get_variant_widths(width):
+    """Ширины копий для оригинала шириной width (хотя бы одна копия есть всегда)"""
+    widths = [value for value in POSTER_WIDTHS if value < width]
+    return widths or [min(width, POSTER_WIDTHS[0])]
+
+
+def resize(image, width):
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+
+
+def convert_for_format(image, format_name):
+    """Прозрачность сохраняется в WebP; для JPEG фон заливается белым"""
+    if format_name == 'webp':
+        return image.convert('RGBA') if image.mode in ('RGBA', 'LA', 'P') else image.convert('RGB')
+    if image.mode in ('RGBA', 'LA', 'P'):
+        rgba = image.convert('RGBA')
+        background = Image.new('RGB', rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def encode(image, options):
+    buffer = io.BytesIO()
+    image.save(buffer, **options)
+    return buffer.getvalue()
+
+
+def open_poster(poster):
+    """Оригинал постера с учётом поворота из EXIF"""
+    with poster.open('rb') as file:
+        image = Image.open(file)
+        image.load()
+    return ImageOps.exif_transpose(image)
+
+
+def build_placeholder(image):
+    """Заглушка шириной PLACEHOLDER_WIDTH пикселей как data: URI (несколько сотен байт)"""
+    small = convert_for_format(resize(image, min(PLACEHOLDER_WIDTH, image.width)), 'webp')
+    return 'data:image/webp;base64,' + base64.b64encode(encode(small, PLACEHOLDER_OPTIONS)).decode('ascii')
+
+
+def generate_poster_variants(poster):
+    """
+    Сохраняет копии постера в хранилище рядом с оригиналом.
+    Возвращает (poster_variants, poster_placeholder).
+    """
+    image = open_poster(poster)
+    storage = poster.storage
+    stem = os.path.splitext(poster.name)[0]
+    variants = {'width': image.width, 'height': image.height}
+    for format_name in POSTER_FORMATS:
+        variants[format_name] = {}
+    for width in get_variant_widths(image.width):
+        resized = resize(image, width) if width != image.width else image
+        for format_name, (extension, options) in POSTER_FORMATS.items():
+            content = encode(convert_for_format(resized, format_name), options)
+            name = storage.save(f'{stem}_{width}w.{extension}', ContentFile(content))
+            variants[format_name][str(width)] = name
+    return variants, build_placeholder(image)
+
+
+def iter_variant_names(variants):
+    for format_name in POSTER_FORMATS:
+        yield from (variants or {}).get(format_name, {}).values()
+
+
+def delete_poster_variants(storage, variants):
+    """Удаляет файлы копий постера из хранилища"""
+    for name in iter_variant_names(variants):
+        storage.delete(name)
+
+
+def process_game_poster(game, previous_variants=None):
+    """
+    Пересоздаёт копии постера игры и сохраняет их в Game.poster_variants
+    (через update, чтобы не вызывать сигналы сохранения игры повторно).
+    Копии прежнего постера (previous_variants, по умолчанию — текущие) удаляются.
+    """
+    storage = game._meta.get_field('poster').storage
+    if previous_variants is None:
+        previous_variants = game.poster_variants
+    variants, placeholder = {}, ''
+    if game.poster:
+        try:
+            variants, placeholder = generate_poster_variants(game.poster)
+        except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+            logger.warning('Не удалось обработать постер игры %s (%s)', game.pk, game.poster.name, exc_info=True)
+    Game.objects.filter(pk=game.pk).update(poster_variants=variants, poster_placeholder=placeholder)
+    game.poster_variants, game.poster_placeholder = variants, placeholder
+    delete_poster_variants(storage, previous_variants)
+
+
+def build_srcset(variants, format_name, build_url):
+    """Строка для srcset: 'url 320w, url 640w'"""
+    widths = sorted((variants or {}).get(format_name, {}).items(), key=lambda item: int(item[0]))
+    return ', '.join(f'{build_url(name)} {width}w' for width, name in widths)
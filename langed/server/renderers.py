@@ -0,0 +1,159 @@
+"""
+Рендереры API: быстрый JSON, MessagePack и колоночный формат для больших списков.
+
+FastJSONRenderer использует orjson, если он установлен, и стандартный json
+(как JSONRenderer DRF), если нет; содержимое ответа от этого не меняется.
+MessagePackRenderer (application/msgpack) подключается в настройках,
+только если установлен msgpack.
+
+ColumnarJSONRenderer (?format=columns) убирает повторы имён полей: в обычном
+JSON они повторяются в каждой строке и занимают большую часть ответа, а в
+колоночном формате список объектов передаётся как схема колонок и массивы значений:
+
+    {
+        "columns": ["id", {"name": "game", "columns": ["id", "name"]}, "masters"],
+        "rows": [[1, [5, "Игра"], [{"id": 2, ...}]], ...]
+    }
+
+Схема строится по полям сериализатора (с учётом ?fields= и ?expand=).
+Вложенный сериализатор описывается объектом {"name", "columns"} (и "many": true
+для списков), значение такой колонки — строка, список строк или null. Вложенные
+значения без сериализатора остаются как есть.
+
+Пагинированный ответ {next, results} превращается в {next, columns, rows};
+ответы, не являющиеся списком объектов (retrieve, ошибки), отдаются обычным JSON.
+Декодер для SPA — front/src/utils/columns.js (decodeColumns).
+"""
+from rest_framework import serializers
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils import encoders
+from rest_framework.utils.serializer_helpers import ReturnList
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# datetime, Decimal, ленивые строки перевода и т.п. приводятся так же,
+# как в стандартном JSONRenderer DRF
+_encoder = encoders.JSONEncoder()
+
+
+def encode_default(obj):
+    return _encoder.default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer на orjson. Без orjson, с отступами (браузерный API, indent=)
+    или с отключёнными COMPACT_JSON/UNICODE_JSON/STRICT_JSON работает как обычный.
+    """
+
+    def use_orjson(self, accepted_media_type, renderer_context):
+        if orjson is None or not self.compact or self.ensure_ascii or not self.strict:
+            return False
+        return self.get_indent(accepted_media_type, renderer_context) is None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+        if data is None or not self.use_orjson(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(
+            data, default=encode_default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        )
+        # Как и JSONRenderer, экранируем U+2028 и U+2029
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class MessagePackRenderer(BaseRenderer):
+    """MessagePack для клиентов, которые запрашивают application/msgpack"""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encode_default, use_bin_type=True)
+
+
+def get_serializer_columns(serializer):
+    """Схема колонок по читаемым полям сериализатора"""
+    columns = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        many = isinstance(field, serializers.ListSerializer)
+        nested = field.child if many else field
+        if isinstance(nested, serializers.BaseSerializer) and hasattr(nested, 'fields'):
+            column = {'name': name, 'columns': get_serializer_columns(nested)}
+            if many:
+                column['many'] = True
+            columns.append(column)
+        else:
+            columns.append(name)
+    return columns
+
+
+def get_row_columns(row):
+    """Схема колонок по ключам первой строки, если сериализатор недоступен"""
+    return list(row.keys())
+
+
+def encode_value(value, column):
+    if value is None:
+        return None
+    if column.get('many'):
+        return [encode_row(item, column['columns']) for item in value]
+    return encode_row(value, column['columns'])
+
+
+def encode_row(row, columns):
+    encoded = []
+    for column in columns:
+        if isinstance(column, dict):
+            encoded.append(encode_value(row.get(column['name']), column))
+        else:
+            encoded.append(row.get(column))
+    return encoded
+
+
+def encode_columns(data):
+    """
+    Превращает список объектов в {columns, rows}.
+    Возвращает None, если данные не являются списком словарей.
+    """
+    if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+        return None
+
+    serializer = getattr(data, 'serializer', None) if isinstance(data, ReturnList) else None
+    child = getattr(serializer, 'child', None)
+    if child is not None and hasattr(child, 'fields'):
+        columns = get_serializer_columns(child)
+    elif data:
+        columns = get_row_columns(data[0])
+    else:
+        columns = []
+    return {'columns': columns, 'rows': [encode_row(row, columns) for row in data]}
+
+
+class ColumnarJSONRenderer(FastJSONRenderer):
+    """JSON-рендерер колоночного формата, включается параметром ?format=columns"""
+    media_type = 'application/vnd.langed.columns+json'
+    format = 'columns'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        encoded = encode_columns(data)
+        if encoded is None and isinstance(data, dict) and isinstance(data.get('results'), list):
+            encoded = encode_columns(data['results'])
+            if encoded is not None:
+                encoded = {**{key: value for key, value in data.items() if key != 'results'}, **encoded}
+        return super().render(data if encoded is None else encoded, accepted_media_type, renderer_context)
@@ -0,0 +1,194 @@
+"""
+Общий кэш ответов API для анонимных GET-запросов.
+
+Ключ ответа — путь, нормализованные параметры запроса (отсортированные) и
+выбранный формат ответа. Каждый ответ помечен тегами моделей, данные которых
+в него входят: 'run:*' — любой прогон (списки), 'convention_event:42' —
+конкретное проведение (детальный ответ). Сигналы при изменении модели или её
+M2M-связей сбрасывают теги '<модель>:*' и '<модель>:<id>' (после коммита).
+
+Сброс тега — смена его версии: версии всех тегов ответа входят в ключ,
+поэтому старые записи просто перестают находиться и истекают сами.
+
+Хранилище подключаемое — это любой кэш Django из CACHES, выбранный настройкой
+RESPONSE_CACHE_ALIAS (в продакшене общий Redis/Memcached, локально и в тестах —
+файловый или locmem). Вместе с телом хранятся его сжатые варианты
+(compression.precompress), поэтому попадание в кэш не сжимает ответ заново.
+RESPONSE_CACHE_ALIAS = None отключает кэш ответов (например, для замеров).
+"""
+import hashlib
+import re
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from rest_framework.response import Response
+
+from .compression import precompress
+
+DEFAULT_TIMEOUT = 10 * 60
+KEY_PREFIX = 'response_cache'
+
+# Заголовки ответа, которые сохраняются вместе с телом
+CACHED_HEADERS = ('ETag', 'Last-Modified', 'Cache-Control')
+
+
+def is_enabled():
+    return getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default') is not None
+
+
+def get_backend():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def get_timeout():
+    return getattr(settings, 'RESPONSE_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+def get_model_tag(model):
+    """Имя модели для тегов: ConventionEvent → 'convention_event'"""
+    return re.sub(r'(?<!^)(?=[A-Z])', '_', model.__name__).lower()
+
+
+def get_tag_key(tag):
+    return f'{KEY_PREFIX}:tag:{tag}'
+
+
+def get_tag_versions(tags):
+    """Текущие версии тегов; потерянные (вытесненные) версии создаются заново"""
+    backend = get_backend()
+    keys = [get_tag_key(tag) for tag in tags]
+    versions = backend.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        backend.set_many(missing, None)
+        versions.update(missing)
+    return [str(versions[key]) for key in keys]
+
+
+def purge_tags(*tags):
+    """Сбрасывает все ответы с указанными тегами"""
+    if not is_enabled():
+        return
+    get_backend().set_many({get_tag_key(tag): time.time_ns() for tag in tags}, None)
+
+
+def purge_model(model, pk=None):
+    """Сбрасывает ответы со списками модели и, если указан pk, с этим объектом"""
+    tag = get_model_tag(model)
+    tags = [f'{tag}:*']
+    if pk is not None:
+        tags.append(f'{tag}:{pk}')
+    # Пока транзакция не завершена, параллельный запрос может закэшировать старые данные
+    # с новой версией тега — поэтому сбрасываем после коммита
+    transaction.on_commit(lambda: purge_tags(*tags))
+
+
+def normalize_query(query_params):
+    """Параметры запроса в каноническом виде: пустые значения отброшены, порядок отсортирован"""
+    return urlencode(sorted(
+        (key, value) for key, values in query_params.lists() for value in values if value != ''
+    ))
+
+
+def build_response(entry):
+    response = HttpResponse(entry['content'], status=entry['status'], content_type=entry['content_type'])
+    for header, value in entry['headers'].items():
+        response[header] = value
+    response.precompressed = entry['precompressed']
+    return response
+
+
+class ResponseCacheMixin:
+    """
+    Кэширует list и retrieve для анонимных пользователей в общем кэше ответов.
+
+    Теги ответа строятся по модели viewset и `conditional_models`
+    (модели, данные которых вложены в ответ), как и для ConditionalGetMixin.
+    Действия из `response_cache_actions` кэшируются через cached_response.
+    """
+    response_cache_actions = ('list', 'retrieve')
+
+    def get_response_cache_models(self):
+        # Имена пользователей в ответах сбрасываются по объектам, где они указаны (signals.py)
+        return tuple(getattr(self, 'conditional_models', ()))
+
+    def get_response_cache_tags(self):
+        model_tag = get_model_tag(self.get_queryset().model)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        if self.detail and lookup_url_kwarg in self.kwargs:
+            tags = [f'{model_tag}:{self.kwargs[lookup_url_kwarg]}']
+        else:
+            tags = [f'{model_tag}:*']
+        return tags + [f'{get_model_tag(model)}:*' for model in self.get_response_cache_models()]
+
+    def get_response_cache_key(self, request):
+        """Ключ ответа или None, если запрос не кэшируется"""
+        if (
+            not is_enabled()
+            or request.method not in ('GET', 'HEAD')
+            or request.user.is_authenticated
+            or self.action not in self.response_cache_actions
+            or getattr(request.accepted_renderer, 'format', None) == 'api'
+        ):
+            return None
+        tags = self.get_response_cache_tags()
+        # Хост и схема входят в ключ: в ответах есть абсолютные ссылки (пагинация)
+        raw = '|'.join((
+            request.scheme, request.get_host(), request.path,
+            normalize_query(request.query_params), request.accepted_media_type,
+            *tags, *get_tag_versions(tags),
+        ))
+        return f'{KEY_PREFIX}:{hashlib.md5(raw.encode("utf-8"), usedforsecurity=False).hexdigest()}'
+
+    def cached_response(self, request, render):
+        """Ответ из кэша или результат render(), который будет сохранён в кэш"""
+        key = self.get_response_cache_key(request)
+        if key is None:
+            return render()
+
+        entry = get_backend().get(key)
+        if entry is not None:
+            headers = entry['headers']
+            response = get_conditional_response(
+                request,
+                etag=headers.get('ETag'),
+                last_modified=parse_http_date_safe(headers['Last-Modified']) if 'Last-Modified' in headers else None,
+            )
+            if response is None:
+                return build_response(entry)
+            for header, value in headers.items():
+                response[header] = value
+            return response
+
+        response = render()
+        if isinstance(response, Response) and response.status_code == 200:
+            response.response_cache_key = key
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        key = getattr(response, 'response_cache_key', None)
+        if key is not None:
+            response.render()
+            entry = {
+                'status': response.status_code,
+                'content': response.content,
+                'content_type': response['Content-Type'],
+                'headers': {header: response[header] for header in CACHED_HEADERS if response.has_header(header)},
+                'precompressed': precompress(response.content),
+            }
+            get_backend().set(key, entry, get_timeout())
+            response.precompressed = entry['precompressed']
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(ResponseCacheMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(ResponseCacheMixin, self).retrieve(request, *args, **kwargs))
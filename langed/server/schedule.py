@@ -0,0 +1,94 @@
+"""
+Кэш публичной части расписания проведения конвента.
+
+Расписание (прогоны, мастера, помещения, общие события, ссылки, площадки,
+игры и счётчики) собирается через ConventionScheduleSerializer без привязки
+к пользователю и хранится в кэше как готовый документ. Сигналы из signals.py
+сбрасывают документ при изменении связанных данных, а на каждый запрос
+вычисляются только персональные поля: can_edit и current_user_registration.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch
+
+from .models import ConventionEvent, ConventionEventRegistration, Run
+from .permissions import get_edit_permissions
+
+# Страховочное время жизни документа на случай изменений в обход сигналов (queryset.update())
+SCHEDULE_CACHE_TIMEOUT = 60 * 60
+
+
+def get_schedule_cache_key(event_id):
+    return f'convention_schedule:{event_id}'
+
+
+def get_schedule_queryset():
+    """QuerySet проведения со всеми данными, которые нужны расписанию"""
+    runs_prefetch = Prefetch(
+        'scheduled_runs',
+        queryset=Run.objects.select_related(
+            'game', 'city'
+        ).defer('game__search_vector').prefetch_related('masters', 'rooms', 'rooms__venue')
+    )
+    return ConventionEvent.objects.select_related(
+        'convention', 'city', 'city__region', 'venue'
+    ).prefetch_related(
+        runs_prefetch,
+        'organizers',
+        'convention__organizers',
+        'convention__links',
+        'venue__rooms',
+        'common_events'
+    )
+
+
+def build_schedule_document(event_id):
+    """Собирает публичный документ расписания (без персональных полей)"""
+    from .serializers import ConventionScheduleSerializer
+
+    event = get_schedule_queryset().get(pk=event_id)
+    return ConventionScheduleSerializer(event, context={}).data
+
+
+def get_schedule_document(event_id):
+    """Возвращает публичный документ расписания из кэша, собирая его при промахе"""
+    key = get_schedule_cache_key(event_id)
+    document = cache.get(key)
+    if document is None:
+        document = build_schedule_document(event_id)
+        cache.set(key, document, SCHEDULE_CACHE_TIMEOUT)
+    return document
+
+
+def invalidate_schedule(*event_ids):
+    """Сбрасывает кэш расписания для указанных проведений"""
+    keys = [get_schedule_cache_key(event_id) for event_id in event_ids if event_id]
+    if keys:
+        # Пока транзакция не завершена (счётчики регистраций обновляются уже после
+        # post_save), параллельный запрос может закэшировать старый документ — сбрасываем после коммита
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def personalize_schedule(document, event, request):
+    """Заполняет в документе расписания поля, зависящие от текущего пользователя"""
+    from .serializers import ConventionEventRegistrationBriefSerializer
+
+    if not request.user.is_authenticated:
+        return document
+
+    permissions = get_edit_permissions({'request': request})
+    can_edit_event = permissions.can_edit_convention_event(event)
+    document['can_edit'] = can_edit_event
+    for run in document['runs']:
+        run['can_edit'] = can_edit_event or permissions.owns('run', run['id'])
+    for common_event in document['common_events']:
+        common_event['can_edit'] = can_edit_event
+
+    registration = ConventionEventRegistration.objects.filter(
+        convention_event=event, user=request.user
+    ).select_related('user').first()
+    if registration is not None:
+        document['current_user_registration'] = ConventionEventRegistrationBriefSerializer(
+            registration, context={'request': request}
+        ).data
+    return document
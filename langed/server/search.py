@@ -0,0 +1,99 @@
+"""
+Полнотекстовый поиск по каталогу игр (?search= в /api/games/).
+
+На PostgreSQL поиск идёт по полю Game.search_vector (tsvector с русской
+морфологией и GIN-индексом): название, имена создателей и анонс с весами
+A, B и C, результаты упорядочены по релевантности. Вектор обновляется
+сигналами при изменении игры, её создателей и их имён. Каталог ищет по мере
+ввода, поэтому последнее слово запроса ищется и как префикс («Вед» находит
+«Ведьмак»), а название дополнительно сравнивается по подстроке.
+
+На SQLite (локальная разработка) — упрощённый поиск по подстроке без
+ранжирования. LIKE в SQLite не приводит кириллицу к нижнему регистру,
+поэтому строки сравниваются в Python; для рабочей базы этот путь не нужен.
+"""
+import re
+from collections import defaultdict
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F, Q, Value
+
+from .models import Game
+
+SEARCH_CONFIG = 'russian'
+
+
+def is_search_supported():
+    """Полнотекстовый поиск доступен только на PostgreSQL"""
+    return connection.vendor == 'postgresql'
+
+
+def build_game_search_vector(creator_names):
+    """Выражение поискового вектора игры; имена создателей передаются строкой"""
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG) +
+        SearchVector(Value(creator_names), weight='B', config=SEARCH_CONFIG) +
+        SearchVector('announcement', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def get_creator_names(game_ids):
+    """Имена создателей игр одной строкой на игру: {game_id: 'Имя Фамилия username ...'}"""
+    names = defaultdict(list)
+    rows = Game.creators.through.objects.filter(game_id__in=game_ids).values_list(
+        'game_id', 'user__first_name', 'user__last_name', 'user__username'
+    )
+    for game_id, first_name, last_name, username in rows:
+        names[game_id].append(' '.join(part for part in (first_name, last_name, username) if part))
+    return {game_id: ' '.join(parts) for game_id, parts in names.items()}
+
+
+def update_game_search_vectors(game_ids):
+    """Пересчитывает поисковые векторы игр (на SQLite ничего не делает)"""
+    if not is_search_supported():
+        return
+    game_ids = set(game_ids)
+    if not game_ids:
+        return
+    creator_names = get_creator_names(game_ids)
+    for game_id in game_ids:
+        Game.objects.filter(pk=game_id).update(
+            search_vector=build_game_search_vector(creator_names.get(game_id, ''))
+        )
+
+
+def build_search_query(text):
+    """
+    Запрос websearch по тексту целиком или те же слова, где последнее — префикс:
+    'ведьмак вед' → websearch('ведьмак вед') | to_tsquery('ведьмак & вед:*')
+    """
+    query = SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+    words = re.findall(r'[^\W_]+', text)
+    if words:
+        prefix_query = ' & '.join(words[:-1] + [f'{words[-1]}:*'])
+        query |= SearchQuery(prefix_query, config=SEARCH_CONFIG, search_type='raw')
+    return query
+
+
+def match_games_in_python(queryset, text):
+    """Игры, в названии, анонсе или именах создателей которых есть text без учёта регистра (для SQLite)"""
+    needle = text.casefold()
+    texts = defaultdict(list)
+    rows = queryset.order_by().values_list(
+        'id', 'name', 'announcement', 'creators__username', 'creators__first_name', 'creators__last_name'
+    )
+    for game_id, *values in rows:
+        texts[game_id].extend(value for value in values if value)
+    return [game_id for game_id, values in texts.items() if any(needle in value.casefold() for value in values)]
+
+
+def search_games(queryset, text):
+    """Фильтрует игры по поисковому запросу и сортирует по релевантности"""
+    if is_search_supported():
+        query = build_search_query(text)
+        return queryset.filter(Q(search_vector=query) | Q(name__icontains=text)).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by('-search_rank', 'name')
+
+    return queryset.filter(pk__in=match_games_in_python(queryset, text)).order_by('name')
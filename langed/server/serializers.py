@@ -1,10 +1,58 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.db import models
 from .models import Game, Run, Convention, ConventionEvent, City, ConventionLink, Region, Venue, Room, Registration, CommonEvent, ConventionEventRegistration
+from .permissions import get_edit_permissions
+from .posters import POSTER_FORMATS, build_srcset
+from .sparse import SparseFieldsMixin
+from .timezones import local_to_utc, to_local_iso, to_local_iso_many
 
 User = get_user_model()
 
 
+def get_current_user_registration(obj, related_name, request):
+    """
+    Возвращает регистрацию текущего пользователя на объект.
+    Использует Prefetch `current_user_registrations` из view, если он есть,
+    иначе делает отдельный запрос.
+    """
+    if not request or not request.user.is_authenticated:
+        return None
+    prefetched = getattr(obj, 'current_user_registrations', None)
+    if prefetched is not None:
+        return prefetched[0] if prefetched else None
+    return getattr(obj, related_name).filter(user=request.user).first()
+
+
+class LocalDateListSerializer(serializers.ListSerializer):
+    """Считает date_local для всего списка одним пакетом, сгруппировав даты по таймзонам"""
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        if 'date_local' in self.child.fields:
+            local_dates = to_local_iso_many(
+                (obj.date, self.child.get_date_timezone(obj)) for obj in items
+            )
+            for obj, local_date in zip(items, local_dates):
+                obj._date_local = (obj.date, local_date)
+        return super().to_representation(items)
+
+
+class LocalDateMixin:
+    """Поле date_local: дата объекта в локальном времени города"""
+
+    def get_date_timezone(self, obj):
+        """Имя таймзоны, в которой показывается дата объекта: по умолчанию — таймзона города объекта"""
+        return obj.city.timezone if obj.city else None
+
+    def get_date_local(self, obj):
+        """Возвращает дату и время в локальной таймзоне города"""
+        precomputed = getattr(obj, '_date_local', None)
+        if precomputed is not None and precomputed[0] == obj.date:
+            return precomputed[1]
+        return to_local_iso(obj.date, self.get_date_timezone(obj))
+
+
 class NaiveDateTimeField(serializers.DateTimeField):
     """
     DateTimeField, который не добавляет таймзону автоматически.
@@ -14,7 +62,7 @@ class NaiveDateTimeField(serializers.DateTimeField):
         return None
 
 
-class UserBriefSerializer(serializers.ModelSerializer):
+class UserBriefSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Краткий сериализатор пользователя"""
     display_name = serializers.SerializerMethodField()
     
@@ -28,14 +76,14 @@ class UserBriefSerializer(serializers.ModelSerializer):
         return obj.username
 
 
-class RegionSerializer(serializers.ModelSerializer):
+class RegionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Сериализатор региона"""
     class Meta:
         model = Region
         fields = ['id', 'name']
 
 
-class CitySerializer(serializers.ModelSerializer):
+class CitySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     region = RegionSerializer(read_only=True)
     
     class Meta:
@@ -43,7 +91,7 @@ class CitySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'region', 'timezone']
 
 
-class RoomSerializer(serializers.ModelSerializer):
+class RoomSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Сериализатор помещения"""
     venue_id = serializers.PrimaryKeyRelatedField(
         queryset=Venue.objects.all(),
@@ -58,7 +106,7 @@ class RoomSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
-class RoomBriefSerializer(serializers.ModelSerializer):
+class RoomBriefSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Краткий сериализатор помещения"""
     venue_id = serializers.IntegerField(source='venue.id', read_only=True)
     
@@ -67,7 +115,7 @@ class RoomBriefSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'blackbox', 'venue_id']
 
 
-class VenueSerializer(serializers.ModelSerializer):
+class VenueSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Сериализатор площадки"""
     city = CitySerializer(read_only=True)
     city_id = serializers.PrimaryKeyRelatedField(
@@ -83,56 +131,68 @@ class VenueSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
-class VenueBriefSerializer(serializers.ModelSerializer):
+class VenueBriefSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Краткий сериализатор площадки"""
     class Meta:
         model = Venue
         fields = ['id', 'name', 'address']
 
 
-class GameSerializer(serializers.ModelSerializer):
+class GameSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     poster_url = serializers.SerializerMethodField()
+    poster_srcset = serializers.SerializerMethodField()
     creators = UserBriefSerializer(many=True, read_only=True)
     can_edit = serializers.SerializerMethodField()
     
     class Meta:
         model = Game
         fields = [
-            'id', 'name', 'creators', 'poster', 'poster_url', 'announcement', 'red_flags',
+            'id', 'name', 'creators', 'poster', 'poster_url', 'poster_srcset', 'poster_placeholder',
+            'announcement', 'red_flags',
             'players_min', 'players_max',
             'female_roles_min', 'female_roles_max',
             'male_roles_min', 'male_roles_max',
             'technicians',
             'can_edit', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'creators', 'created_at', 'updated_at', 'poster_url', 'can_edit']
+        read_only_fields = [
+            'id', 'creators', 'created_at', 'updated_at', 'poster_url', 'poster_srcset', 'poster_placeholder', 'can_edit'
+        ]
     
+    def build_media_url(self, url):
+        request = self.context.get('request')
+        if request:
+            return request.build_absolute_uri(url)
+        return url
+
     def get_poster_url(self, obj):
         if obj.poster:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.poster.url)
-            return obj.poster.url
+            return self.build_media_url(obj.poster.url)
         return None
+
+    def get_poster_srcset(self, obj):
+        """Уменьшенные копии постера для srcset: {'webp': 'url 320w, url 640w', 'jpeg': ...}"""
+        if not obj.poster or not obj.poster_variants:
+            return None
+        storage = obj.poster.storage
+        return {
+            format_name: build_srcset(obj.poster_variants, format_name, lambda name: self.build_media_url(storage.url(name)))
+            for format_name in POSTER_FORMATS
+        }
     
     def get_can_edit(self, obj):
         """Проверяем, может ли текущий пользователь редактировать игру"""
-        request = self.context.get('request')
-        if not request or not request.user.is_authenticated:
-            return False
-        if request.user.is_staff:
-            return True
-        return request.user in obj.creators.all()
+        return get_edit_permissions(self.context).can_edit_game(obj)
 
 
-class GameBriefSerializer(serializers.ModelSerializer):
+class GameBriefSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Краткий сериализатор игры"""
     class Meta:
         model = Game
         fields = ['id', 'name', 'players_min', 'players_max']
 
 
-class ConventionLinkSerializer(serializers.ModelSerializer):
+class ConventionLinkSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Сериализатор ссылки конвента"""
     display_title = serializers.SerializerMethodField()
     link_type_display = serializers.CharField(source='get_link_type_display', read_only=True)
@@ -151,7 +211,7 @@ class ConventionLinkSerializer(serializers.ModelSerializer):
         return obj.get_display_title()
 
 
-class ConventionSerializer(serializers.ModelSerializer):
+class ConventionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Сериализатор конвента (без дат - просто справочник)"""
     organizers = UserBriefSerializer(many=True, read_only=True)
     events_count = serializers.IntegerField(source='events.count', read_only=True)
@@ -168,15 +228,10 @@ class ConventionSerializer(serializers.ModelSerializer):
     
     def get_can_edit(self, obj):
         """Проверяем, может ли текущий пользователь редактировать конвент"""
-        request = self.context.get('request')
-        if not request or not request.user.is_authenticated:
-            return False
-        if request.user.is_staff:
-            return True
-        return request.user in obj.organizers.all()
+        return get_edit_permissions(self.context).can_edit_convention(obj)
 
 
-class RunBriefSerializer(serializers.ModelSerializer):
+class RunBriefSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Краткий сериализатор прогона для вложения в проведение конвента"""
     game_name = serializers.CharField(source='game.name', read_only=True)
     
@@ -185,7 +240,7 @@ class RunBriefSerializer(serializers.ModelSerializer):
         fields = ['id', 'game_name', 'date']
 
 
-class ScheduleRunSerializer(serializers.ModelSerializer):
+class ScheduleRunSerializer(LocalDateMixin, SparseFieldsMixin, serializers.ModelSerializer):
     """Сериализатор прогона для расписания конвента"""
     game = GameBriefSerializer(read_only=True)
     game_id = serializers.PrimaryKeyRelatedField(
@@ -224,18 +279,7 @@ class ScheduleRunSerializer(serializers.ModelSerializer):
             'effective_max_players', 'can_edit'
         ]
         read_only_fields = ['id', 'masters', 'can_edit']
-    
-    def get_date_local(self, obj):
-        """Возвращает дату и время в локальной таймзоне города"""
-        import pytz
-        if obj.date and obj.city and obj.city.timezone:
-            try:
-                tz = pytz.timezone(obj.city.timezone)
-                local_dt = obj.date.astimezone(tz)
-                return local_dt.strftime('%Y-%m-%dT%H:%M:%S')
-            except Exception:
-                pass
-        return obj.date.isoformat() if obj.date else None
+        list_serializer_class = LocalDateListSerializer
     
     def validate_date(self, value):
         """
@@ -243,37 +287,11 @@ class ScheduleRunSerializer(serializers.ModelSerializer):
         Дата приходит с фронтенда в формате без таймзоны (например 2026-01-15T14:00:00),
         интерпретируется как локальное время в таймзоне города конвента.
         """
-        import pytz
-        from django.utils import timezone as django_timezone
-        
-        # Если дата уже aware (с таймзоной), возвращаем как есть
-        if django_timezone.is_aware(value):
-            return value
-        
-        # Получаем таймзону из контекста (передаётся явно из view)
+        # Таймзона передаётся явно из view, иначе берётся из существующего прогона
         city_timezone = self.context.get('city_timezone')
-        
-        # Если нет в контексте, пробуем из существующего прогона
-        if not city_timezone and self.instance and self.instance.city:
-            city_timezone = self.instance.city.timezone
-        
-        if city_timezone:
-            try:
-                tz = pytz.timezone(city_timezone)
-                # Интерпретируем naive datetime как локальное время в этой таймзоне
-                local_dt = tz.localize(value)
-                # Конвертируем в UTC
-                return local_dt.astimezone(pytz.UTC)
-            except Exception:
-                pass
-        
-        # Если не удалось определить таймзону, используем дефолтную (Москва)
-        try:
-            default_tz = pytz.timezone('Europe/Moscow')
-            local_dt = default_tz.localize(value)
-            return local_dt.astimezone(pytz.UTC)
-        except Exception:
-            return value
+        if not city_timezone and self.instance:
+            city_timezone = self.get_date_timezone(self.instance)
+        return local_to_utc(value, city_timezone)
     
     def validate(self, attrs):
         """Проверяем, что дата прогона попадает в даты проведения конвента"""
@@ -308,23 +326,11 @@ class ScheduleRunSerializer(serializers.ModelSerializer):
         return obj.get_max_players()
     
     def get_can_edit(self, obj):
-        request = self.context.get('request')
-        if not request or not request.user.is_authenticated:
-            return False
-        if request.user.is_staff:
-            return True
         # Может редактировать мастер прогона или организатор конвента
-        if request.user in obj.masters.all():
-            return True
-        if obj.convention_event:
-            if request.user in obj.convention_event.organizers.all():
-                return True
-            if request.user in obj.convention_event.convention.organizers.all():
-                return True
-        return False
+        return get_edit_permissions(self.context).can_edit_scheduled_run(obj)
 
 
-class CommonEventSerializer(serializers.ModelSerializer):
+class CommonEventSerializer(LocalDateMixin, SparseFieldsMixin, serializers.ModelSerializer):
     """Сериализатор общего события расписания"""
     convention_event_id = serializers.PrimaryKeyRelatedField(
         queryset=ConventionEvent.objects.all(),
@@ -344,55 +350,21 @@ class CommonEventSerializer(serializers.ModelSerializer):
             'duration', 'description', 'can_edit', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'can_edit']
+        list_serializer_class = LocalDateListSerializer
     
-    def get_date_local(self, obj):
-        """Возвращает дату и время в локальной таймзоне города"""
-        import pytz
+    def get_date_timezone(self, obj):
         city = obj.convention_event.city if obj.convention_event else None
-        if obj.date and city and city.timezone:
-            try:
-                tz = pytz.timezone(city.timezone)
-                local_dt = obj.date.astimezone(tz)
-                return local_dt.strftime('%Y-%m-%dT%H:%M:%S')
-            except Exception:
-                pass
-        return obj.date.isoformat() if obj.date else None
+        return city.timezone if city else None
     
     def validate_date(self, value):
         """
         Конвертирует локальное время в UTC с учётом таймзоны города.
         """
-        import pytz
-        from django.utils import timezone as django_timezone
-        
-        # Если дата уже aware (с таймзоной), возвращаем как есть
-        if django_timezone.is_aware(value):
-            return value
-        
-        # Получаем таймзону из контекста (передаётся явно из view)
+        # Таймзона передаётся явно из view, иначе берётся из существующего события
         city_timezone = self.context.get('city_timezone')
-        
-        # Если нет в контексте, пробуем из существующего события
-        if not city_timezone and self.instance and self.instance.convention_event:
-            city_timezone = self.instance.convention_event.city.timezone
-        
-        if city_timezone:
-            try:
-                tz = pytz.timezone(city_timezone)
-                # Интерпретируем naive datetime как локальное время в этой таймзоне
-                local_dt = tz.localize(value)
-                # Конвертируем в UTC
-                return local_dt.astimezone(pytz.UTC)
-            except Exception:
-                pass
-        
-        # Если не удалось определить таймзону, используем дефолтную (Москва)
-        try:
-            default_tz = pytz.timezone('Europe/Moscow')
-            local_dt = default_tz.localize(value)
-            return local_dt.astimezone(pytz.UTC)
-        except Exception:
-            return value
+        if not city_timezone and self.instance:
+            city_timezone = self.get_date_timezone(self.instance)
+        return local_to_utc(value, city_timezone)
     
     def validate(self, attrs):
         """Проверяем, что дата события попадает в даты проведения конвента"""
@@ -413,21 +385,13 @@ class CommonEventSerializer(serializers.ModelSerializer):
         return attrs
     
     def get_can_edit(self, obj):
-        request = self.context.get('request')
-        if not request or not request.user.is_authenticated:
-            return False
-        if request.user.is_staff:
-            return True
         # Может редактировать организатор проведения или конвента
-        if obj.convention_event:
-            if request.user in obj.convention_event.organizers.all():
-                return True
-            if request.user in obj.convention_event.convention.organizers.all():
-                return True
-        return False
+        if not obj.convention_event_id:
+            return get_edit_permissions(self.context).is_staff
+        return get_edit_permissions(self.context).can_edit_convention_event(obj.convention_event)
 
 
-class ConventionScheduleSerializer(serializers.ModelSerializer):
+class ConventionScheduleSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Сериализатор расписания проведения конвента"""
     convention = serializers.PrimaryKeyRelatedField(read_only=True)
     convention_name = serializers.CharField(source='convention.name', read_only=True)
@@ -493,14 +457,7 @@ class ConventionScheduleSerializer(serializers.ModelSerializer):
         return GameBriefSerializer(list(games), many=True, context=self.context).data
     
     def get_can_edit(self, obj):
-        request = self.context.get('request')
-        if not request or not request.user.is_authenticated:
-            return False
-        if request.user.is_staff:
-            return True
-        is_event_organizer = request.user in obj.organizers.all()
-        is_convention_organizer = request.user in obj.convention.organizers.all()
-        return is_event_organizer or is_convention_organizer
+        return get_edit_permissions(self.context).can_edit_convention_event(obj)
     
     def get_registrations_count(self, obj):
         """Количество подтверждённых регистраций"""
@@ -520,17 +477,13 @@ class ConventionScheduleSerializer(serializers.ModelSerializer):
     
     def get_current_user_registration(self, obj):
         """Регистрация текущего пользователя на этот конвент"""
-        request = self.context.get('request')
-        if not request or not request.user.is_authenticated:
-            return None
-        try:
-            registration = obj.event_registrations.get(user=request.user)
-            return ConventionEventRegistrationBriefSerializer(registration, context=self.context).data
-        except ConventionEventRegistration.DoesNotExist:
+        registration = get_current_user_registration(obj, 'event_registrations', self.context.get('request'))
+        if registration is None:
             return None
+        return ConventionEventRegistrationBriefSerializer(registration, context=self.context).data
 
 
-class ConventionEventSerializer(serializers.ModelSerializer):
+class ConventionEventSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Сериализатор проведения конвента"""
     convention = serializers.PrimaryKeyRelatedField(read_only=True)
     convention_name = serializers.CharField(source='convention.name', read_only=True)
@@ -583,14 +536,7 @@ class ConventionEventSerializer(serializers.ModelSerializer):
     
     def get_can_edit(self, obj):
         """Проверяем, может ли текущий пользователь редактировать проведение"""
-        request = self.context.get('request')
-        if not request or not request.user.is_authenticated:
-            return False
-        if request.user.is_staff:
-            return True
-        is_event_organizer = request.user in obj.organizers.all()
-        is_convention_organizer = request.user in obj.convention.organizers.all()
-        return is_event_organizer or is_convention_organizer
+        return get_edit_permissions(self.context).can_edit_convention_event(obj)
     
     def get_registrations_count(self, obj):
         """Количество подтверждённых регистраций"""
@@ -610,14 +556,10 @@ class ConventionEventSerializer(serializers.ModelSerializer):
     
     def get_current_user_registration(self, obj):
         """Регистрация текущего пользователя на этот конвент"""
-        request = self.context.get('request')
-        if not request or not request.user.is_authenticated:
-            return None
-        try:
-            registration = obj.event_registrations.get(user=request.user)
-            return ConventionEventRegistrationBriefSerializer(registration, context=self.context).data
-        except ConventionEventRegistration.DoesNotExist:
+        registration = get_current_user_registration(obj, 'event_registrations', self.context.get('request'))
+        if registration is None:
             return None
+        return ConventionEventRegistrationBriefSerializer(registration, context=self.context).data
 
     class Meta:
         model = ConventionEvent
@@ -635,7 +577,7 @@ class ConventionEventSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'organizers', 'created_at', 'updated_at', 'can_edit']
 
 
-class RegistrationSerializer(serializers.ModelSerializer):
+class RegistrationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Сериализатор регистрации на прогон"""
     user = UserBriefSerializer(read_only=True)
     run_id = serializers.PrimaryKeyRelatedField(
@@ -656,7 +598,7 @@ class RegistrationSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'user', 'created_at', 'updated_at']
 
 
-class RegistrationBriefSerializer(serializers.ModelSerializer):
+class RegistrationBriefSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Краткий сериализатор регистрации для списка участников"""
     user = UserBriefSerializer(read_only=True)
     
@@ -665,7 +607,7 @@ class RegistrationBriefSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'role_preference', 'is_technician', 'status']
 
 
-class ConventionEventRegistrationSerializer(serializers.ModelSerializer):
+class ConventionEventRegistrationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Полный сериализатор регистрации на проведение конвента"""
     user = UserBriefSerializer(read_only=True)
     convention_event_id = serializers.PrimaryKeyRelatedField(
@@ -686,7 +628,7 @@ class ConventionEventRegistrationSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'user', 'created_at', 'updated_at']
 
 
-class ConventionEventRegistrationBriefSerializer(serializers.ModelSerializer):
+class ConventionEventRegistrationBriefSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Краткий сериализатор регистрации на конвент для списков"""
     user = UserBriefSerializer(read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
@@ -696,7 +638,7 @@ class ConventionEventRegistrationBriefSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'status', 'status_display', 'created_at']
 
 
-class RunSerializer(serializers.ModelSerializer):
+class RunSerializer(LocalDateMixin, SparseFieldsMixin, serializers.ModelSerializer):
     game = GameSerializer(read_only=True)
     game_id = serializers.PrimaryKeyRelatedField(
         queryset=Game.objects.all(),
@@ -755,18 +697,7 @@ class RunSerializer(serializers.ModelSerializer):
             'can_edit', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'masters', 'created_at', 'updated_at', 'can_edit']
-    
-    def get_date_local(self, obj):
-        """Возвращает дату и время в локальной таймзоне города"""
-        import pytz
-        if obj.date and obj.city and obj.city.timezone:
-            try:
-                tz = pytz.timezone(obj.city.timezone)
-                local_dt = obj.date.astimezone(tz)
-                return local_dt.strftime('%Y-%m-%dT%H:%M:%S')
-            except Exception:
-                pass
-        return obj.date.isoformat() if obj.date else None
+        list_serializer_class = LocalDateListSerializer
     
     def validate(self, attrs):
         """
@@ -775,11 +706,8 @@ class RunSerializer(serializers.ModelSerializer):
         интерпретируется как локальное время в таймзоне города.
         Также проверяет, что дата прогона попадает в даты проведения конвента.
         """
-        import pytz
-        from django.utils import timezone as django_timezone
-        
         date_value = attrs.get('date')
-        if date_value and not django_timezone.is_aware(date_value):
+        if date_value:
             city_timezone = None
             
             # Получаем таймзону из города в данных запроса
@@ -788,26 +716,11 @@ class RunSerializer(serializers.ModelSerializer):
                 city_timezone = city.timezone
             
             # Если нет в данных, пробуем из существующего прогона
-            if not city_timezone and self.instance and self.instance.city:
-                city_timezone = self.instance.city.timezone
+            if not city_timezone and self.instance:
+                city_timezone = self.get_date_timezone(self.instance)
             
-            if city_timezone:
-                try:
-                    tz = pytz.timezone(city_timezone)
-                    # Интерпретируем naive datetime как локальное время в этой таймзоне
-                    local_dt = tz.localize(date_value)
-                    # Конвертируем в UTC
-                    attrs['date'] = local_dt.astimezone(pytz.UTC)
-                except Exception:
-                    pass
-            else:
-                # Если не удалось определить таймзону, используем дефолтную (Москва)
-                try:
-                    default_tz = pytz.timezone('Europe/Moscow')
-                    local_dt = default_tz.localize(date_value)
-                    attrs['date'] = local_dt.astimezone(pytz.UTC)
-                except Exception:
-                    pass
+            # Без таймзоны города используется таймзона по умолчанию (Москва)
+            attrs['date'] = local_to_utc(date_value, city_timezone)
         
         # Проверяем, что дата прогона попадает в даты проведения конвента
         convention_event = attrs.get('convention_event')
@@ -846,12 +759,7 @@ class RunSerializer(serializers.ModelSerializer):
     
     def get_can_edit(self, obj):
         """Проверяем, может ли текущий пользователь редактировать прогон"""
-        request = self.context.get('request')
-        if not request or not request.user.is_authenticated:
-            return False
-        if request.user.is_staff:
-            return True
-        return request.user in obj.masters.all()
+        return get_edit_permissions(self.context).is_run_master(obj)
     
     def get_registered_count(self, obj):
         """Количество зарегистрированных игроков"""
@@ -871,11 +779,7 @@ class RunSerializer(serializers.ModelSerializer):
     
     def get_current_user_registration(self, obj):
         """Регистрация текущего пользователя на этот прогон"""
-        request = self.context.get('request')
-        if not request or not request.user.is_authenticated:
-            return None
-        try:
-            registration = obj.registrations.get(user=request.user)
-            return RegistrationBriefSerializer(registration, context=self.context).data
-        except Registration.DoesNotExist:
+        registration = get_current_user_registration(obj, 'registrations', self.context.get('request'))
+        if registration is None:
             return None
+        return RegistrationBriefSerializer(registration, context=self.context).data
@@ -0,0 +1,331 @@
+"""
+Сигналы моделей:
+
+- сброс кэша расписаний конвентов при изменении прогонов, событий и связанных данных;
+- обновление поисковых векторов игр и кэша поиска пользователей;
+- отслеживание изменений публичных полей пользователя (имя, email);
+- пересчёт счётчиков регистраций при удалении регистраций;
+- создание и удаление копий постеров игр;
+- сброс общего кэша ответов API по тегам моделей.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import (
+    City, CommonEvent, Convention, ConventionEvent, ConventionEventRegistration,
+    ConventionLink, Game, Region, Registration, Room, Run, Venue,
+    get_counter_changes, get_event_registration_counters, get_registration_counters, update_counters,
+)
+from .posters import delete_poster_variants, process_game_poster
+from .response_cache import purge_model
+from .schedule import invalidate_schedule
+from .search import update_game_search_vectors
+from .user_search import invalidate_user_search
+
+
+def _event_ids(queryset):
+    return list(queryset.order_by().values_list('id', flat=True).distinct())
+
+
+@receiver(pre_save, sender=Run)
+def remember_run_convention_event(sender, instance, **kwargs):
+    """Запоминаем прежнее проведение, чтобы сбросить и его расписание при переносе прогона"""
+    instance._previous_convention_event_id = None
+    if instance.pk:
+        instance._previous_convention_event_id = Run.objects.filter(
+            pk=instance.pk
+        ).values_list('convention_event_id', flat=True).first()
+
+
+@receiver(post_save, sender=Run)
+@receiver(post_delete, sender=Run)
+def run_changed(sender, instance, **kwargs):
+    invalidate_schedule(
+        instance.convention_event_id,
+        getattr(instance, '_previous_convention_event_id', None)
+    )
+
+
+@receiver(post_save, sender=CommonEvent)
+@receiver(post_delete, sender=CommonEvent)
+def common_event_changed(sender, instance, **kwargs):
+    invalidate_schedule(instance.convention_event_id)
+
+
+@receiver(post_save, sender=Registration)
+@receiver(post_delete, sender=Registration)
+def registration_changed(sender, instance, **kwargs):
+    event_id = Run.objects.filter(pk=instance.run_id).values_list('convention_event_id', flat=True).first()
+    invalidate_schedule(event_id)
+
+
+@receiver(post_save, sender=ConventionEventRegistration)
+@receiver(post_delete, sender=ConventionEventRegistration)
+def convention_event_registration_changed(sender, instance, **kwargs):
+    invalidate_schedule(instance.convention_event_id)
+
+
+@receiver(post_save, sender=ConventionEvent)
+@receiver(post_delete, sender=ConventionEvent)
+def convention_event_changed(sender, instance, **kwargs):
+    invalidate_schedule(instance.pk)
+
+
+@receiver(post_save, sender=Convention)
+def convention_changed(sender, instance, **kwargs):
+    invalidate_schedule(*_event_ids(ConventionEvent.objects.filter(convention=instance)))
+
+
+@receiver(post_save, sender=ConventionLink)
+@receiver(post_delete, sender=ConventionLink)
+def convention_link_changed(sender, instance, **kwargs):
+    invalidate_schedule(*_event_ids(ConventionEvent.objects.filter(convention_id=instance.convention_id)))
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+def room_changed(sender, instance, **kwargs):
+    invalidate_schedule(*_event_ids(ConventionEvent.objects.filter(
+        Q(venue_id=instance.venue_id) | Q(scheduled_runs__rooms__venue_id=instance.venue_id)
+    )))
+
+
+@receiver(post_save, sender=Venue)
+def venue_changed(sender, instance, **kwargs):
+    invalidate_schedule(*_event_ids(ConventionEvent.objects.filter(
+        Q(venue=instance) | Q(scheduled_runs__rooms__venue=instance)
+    )))
+
+
+@receiver(post_save, sender=Game)
+def game_changed(sender, instance, **kwargs):
+    invalidate_schedule(*_event_ids(ConventionEvent.objects.filter(scheduled_runs__game=instance)))
+
+
+@receiver(post_save, sender=City)
+def city_changed(sender, instance, **kwargs):
+    invalidate_schedule(*_event_ids(ConventionEvent.objects.filter(city=instance)))
+
+
+# Для очистки связи со стороны пользователя/помещения pk_set не передаётся,
+# поэтому затронутые объекты собираем на pre_clear, пока связь ещё существует
+M2M_ACTIONS = ('post_add', 'post_remove', 'pre_clear')
+
+
+@receiver(m2m_changed, sender=Run.masters.through)
+@receiver(m2m_changed, sender=Run.rooms.through)
+def run_m2m_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in M2M_ACTIONS:
+        return
+    if not reverse:
+        invalidate_schedule(instance.convention_event_id)
+        return
+    if action == 'pre_clear':
+        related = 'masters' if sender is Run.masters.through else 'rooms'
+        runs = Run.objects.filter(**{related: instance})
+    else:
+        runs = Run.objects.filter(pk__in=pk_set)
+    invalidate_schedule(*_event_ids(ConventionEvent.objects.filter(scheduled_runs__in=runs)))
+
+
+@receiver(m2m_changed, sender=ConventionEvent.organizers.through)
+def convention_event_organizers_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in M2M_ACTIONS:
+        return
+    if not reverse:
+        invalidate_schedule(instance.pk)
+    elif action == 'pre_clear':
+        invalidate_schedule(*_event_ids(instance.organized_convention_events.all()))
+    else:
+        invalidate_schedule(*pk_set)
+
+
+@receiver(m2m_changed, sender=Convention.organizers.through)
+def convention_organizers_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in M2M_ACTIONS:
+        return
+    if not reverse:
+        events = ConventionEvent.objects.filter(convention=instance)
+    elif action == 'pre_clear':
+        events = ConventionEvent.objects.filter(convention__organizers=instance)
+    else:
+        events = ConventionEvent.objects.filter(convention_id__in=pk_set)
+    invalidate_schedule(*_event_ids(events))
+
+
+# Пользователь попадает в расписания, поисковые векторы игр, поиск пользователей и
+# ответы API только именем и почтой. При каждом входе через OIDC пользователь
+# сохраняется целиком, поэтому кэши сбрасываются, только если эти поля изменились.
+USER_PUBLIC_FIELDS = ('username', 'first_name', 'last_name', 'email')
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def remember_user_public_fields(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not set(update_fields) & set(USER_PUBLIC_FIELDS):
+        instance._public_fields_changed = False
+    elif instance._state.adding:
+        instance._public_fields_changed = True
+    else:
+        previous = sender.objects.filter(pk=instance.pk).values_list(*USER_PUBLIC_FIELDS).first()
+        current = tuple(getattr(instance, name) for name in USER_PUBLIC_FIELDS)
+        instance._public_fields_changed = previous != current
+
+
+def user_public_fields_changed(instance):
+    return getattr(instance, '_public_fields_changed', True)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_changed(sender, instance, created, **kwargs):
+    """Имена мастеров и организаторов входят в расписание"""
+    if created or not user_public_fields_changed(instance):
+        return
+    invalidate_schedule(*_event_ids(ConventionEvent.objects.filter(
+        Q(organizers=instance) | Q(convention__organizers=instance) | Q(scheduled_runs__masters=instance)
+    )))
+
+
+# Поисковые векторы игр: название, анонс и имена создателей
+
+
+@receiver(post_save, sender=Game)
+def update_game_search(sender, instance, **kwargs):
+    update_game_search_vectors([instance.pk])
+
+
+@receiver(m2m_changed, sender=Game.creators.through)
+def game_creators_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            update_game_search_vectors([instance.pk])
+    elif action == 'pre_clear':
+        # При очистке игр пользователя pk_set не передаётся: запоминаем их, пока связь существует
+        instance._cleared_game_ids = list(instance.games.values_list('id', flat=True))
+    elif action == 'post_clear':
+        update_game_search_vectors(getattr(instance, '_cleared_game_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        update_game_search_vectors(pk_set)
+
+
+# Копии постеров игр: пересоздаются, только если загружен другой файл.
+# Файлы создаются и удаляются после коммита: при откате транзакции на диске
+# не остаётся копий, на которые не ссылается ни одна игра.
+
+
+@receiver(pre_save, sender=Game)
+def remember_game_poster(sender, instance, **kwargs):
+    instance._previous_poster = None
+    if instance.pk:
+        instance._previous_poster = Game.objects.filter(
+            pk=instance.pk
+        ).values_list('poster', 'poster_variants').first()
+
+
+@receiver(post_save, sender=Game)
+def update_game_poster_variants(sender, instance, created, **kwargs):
+    previous_name, previous_variants = getattr(instance, '_previous_poster', None) or (None, {})
+    if created or (instance.poster.name or None) != (previous_name or None):
+        transaction.on_commit(lambda: process_game_poster(instance, previous_variants))
+
+
+@receiver(post_delete, sender=Game)
+def delete_game_poster_variants(sender, instance, **kwargs):
+    storage, variants = instance._meta.get_field('poster').storage, instance.poster_variants
+    transaction.on_commit(lambda: delete_poster_variants(storage, variants))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def update_user_games_search(sender, instance, created, **kwargs):
+    """Имена создателей входят в поисковый вектор игры"""
+    if created or not user_public_fields_changed(instance):
+        return
+    update_game_search_vectors(instance.games.values_list('id', flat=True))
+
+
+# Кэш поиска пользователей для автодополнения
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_search_changed(sender, instance, **kwargs):
+    if user_public_fields_changed(instance):
+        invalidate_user_search()
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def user_search_deleted(sender, instance, **kwargs):
+    invalidate_user_search()
+
+
+# Счётчики регистраций прогонов и проведений. Создание и изменение учитывает save()
+# регистрации; удаление — здесь, чтобы учесть и каскадное удаление (например, вместе
+# с пользователем). post_delete вызывается внутри транзакции удаления.
+
+
+@receiver(post_delete, sender=Registration)
+def registration_deleted(sender, instance, **kwargs):
+    previous = (instance.run_id, instance.status, instance.is_technician)
+    update_counters(Run, get_counter_changes(previous, None, get_registration_counters))
+
+
+@receiver(post_delete, sender=ConventionEventRegistration)
+def convention_event_registration_deleted(sender, instance, **kwargs):
+    previous = (instance.convention_event_id, instance.status)
+    update_counters(ConventionEvent, get_counter_changes(previous, None, get_event_registration_counters))
+
+
+# Общий кэш ответов API: изменение модели сбрасывает теги '<модель>:*' и '<модель>:<id>'
+
+RESPONSE_CACHE_MODELS = (
+    Region, City, Game, Convention, ConventionLink, ConventionEvent, Venue, Room, Run,
+    CommonEvent, Registration, ConventionEventRegistration,
+)
+# Где в ответах API указаны имена пользователей: модель → путь к пользователю
+RESPONSE_CACHE_USER_RELATIONS = (
+    (Run, 'masters'),
+    (Run, 'registrations__user'),
+    (Game, 'creators'),
+    (ConventionEvent, 'organizers'),
+    (ConventionEvent, 'convention__organizers'),
+    (ConventionEvent, 'event_registrations__user'),
+)
+RESPONSE_CACHE_M2M = (
+    Run.masters.through, Run.rooms.through, Game.creators.through,
+    ConventionEvent.organizers.through, Convention.organizers.through,
+)
+
+
+def response_cache_model_changed(sender, instance, **kwargs):
+    purge_model(sender, instance.pk)
+
+
+def response_cache_user_changed(sender, instance, created=False, **kwargs):
+    """
+    Сбрасывает ответы с объектами, где указан пользователь. При удалении вызывается
+    на pre_delete, пока связи пользователя ещё существуют.
+    """
+    if created or (kwargs['signal'] is post_save and not user_public_fields_changed(instance)):
+        return
+    for model, lookup in RESPONSE_CACHE_USER_RELATIONS:
+        for pk in model.objects.filter(**{lookup: instance}).order_by().values_list('pk', flat=True).distinct():
+            purge_model(model, pk)
+
+
+def response_cache_m2m_changed(sender, instance, action, model, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    purge_model(type(instance), instance.pk)
+    purge_model(model)
+    for pk in pk_set or ():
+        purge_model(model, pk)
+
+
+for cached_model in RESPONSE_CACHE_MODELS:
+    post_save.connect(response_cache_model_changed, sender=cached_model)
+    post_delete.connect(response_cache_model_changed, sender=cached_model)
+post_save.connect(response_cache_user_changed, sender=settings.AUTH_USER_MODEL)
+pre_delete.connect(response_cache_user_changed, sender=settings.AUTH_USER_MODEL)
+for through in RESPONSE_CACHE_M2M:
+    m2m_changed.connect(response_cache_m2m_changed, sender=through)
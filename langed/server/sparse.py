@@ -0,0 +1,123 @@
+"""
+Выборочные поля (?fields=) и раскрытие вложенных объектов (?expand=) для API.
+
+Без параметра `fields` ответы остаются полными, как раньше. Если он передан,
+возвращаются только перечисленные поля; вложенные объекты по умолчанию
+сворачиваются до id и раскрываются, если указаны в `expand` или через точку
+в `fields`:
+
+    /api/runs/?fields=id,date,game,masters&expand=masters
+    /api/runs/?fields=id,date,game.id,game.name
+
+Выбор полей передаётся в view, чтобы не загружать лишние колонки (.defer())
+и не выполнять ненужные prefetch.
+"""
+from rest_framework import serializers
+
+
+def parse_field_paths(value):
+    """Разбирает 'id,game.name,game.id' в дерево {'id': {}, 'game': {'name': {}, 'id': {}}}"""
+    tree = {}
+    for path in (value or '').split(','):
+        path = path.strip()
+        if not path:
+            continue
+        node = tree
+        for part in path.split('.'):
+            node = node.setdefault(part, {})
+    return tree
+
+
+class FieldSelection:
+    """Выбранные поля сериализатора и раскрываемые вложенные объекты"""
+
+    def __init__(self, fields=None, expand=None):
+        self.fields = fields or None
+        self.expand = expand or {}
+
+    @classmethod
+    def from_request(cls, request):
+        if request is None:
+            return cls()
+        params = request.query_params
+        return cls(parse_field_paths(params.get('fields')), parse_field_paths(params.get('expand')))
+
+    @property
+    def is_sparse(self):
+        return self.fields is not None
+
+    def expands(self, name):
+        """Раскрывается ли вложенный объект целиком или подмножеством полей"""
+        return name in self.expand or bool(self.fields and self.fields.get(name))
+
+    def child(self, name):
+        """Выбор полей для вложенного сериализатора"""
+        if not self.is_sparse:
+            return FieldSelection()
+        return FieldSelection(self.fields.get(name), self.expand.get(name))
+
+    def includes(self, path):
+        """
+        Попадёт ли поле в ответ. Путь может быть вложенным ('game.announcement'):
+        поле вложенного объекта попадает в ответ, только если объект раскрыт.
+        """
+        name, _, rest = path.partition('.')
+        if not self.is_sparse:
+            return True
+        if name not in self.fields:
+            return False
+        if not rest:
+            return True
+        return self.expands(name) and self.child(name).includes(rest)
+
+
+class SparseFieldsMixin:
+    """
+    Миксин сериализатора: оставляет только выбранные поля.
+    Поля только для записи не трогаются, чтобы не ломать создание и изменение.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._field_selection = kwargs.pop('field_selection', None) or FieldSelection()
+        super().__init__(*args, **kwargs)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selection = self._field_selection
+        if not selection.is_sparse:
+            return fields
+
+        selected = {}
+        for name, field in fields.items():
+            if field.write_only:
+                selected[name] = field
+                continue
+            if not selection.includes(name):
+                continue
+            many = isinstance(field, serializers.ListSerializer)
+            nested = field.child if many else field
+            if isinstance(nested, serializers.BaseSerializer):
+                if selection.expands(name):
+                    nested._field_selection = selection.child(name)
+                else:
+                    # Нераскрытый вложенный объект отдаём как id
+                    field = serializers.PrimaryKeyRelatedField(source=field.source, read_only=True, many=many)
+            selected[name] = field
+        return selected
+
+
+class SparseFieldsViewMixin:
+    """Миксин view: передаёт выбор полей из запроса в сериализатор"""
+
+    def get_field_selection(self):
+        """Выбор полей действует только на чтение"""
+        if not hasattr(self, '_field_selection'):
+            if self.request.method in ('GET', 'HEAD'):
+                self._field_selection = FieldSelection.from_request(self.request)
+            else:
+                self._field_selection = FieldSelection()
+        return self._field_selection
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('field_selection', self.get_field_selection())
+        return super().get_serializer(*args, **kwargs)
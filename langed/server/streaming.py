@@ -0,0 +1,98 @@
+"""
+Потоковая отдача больших списков API (?stream=json или ?stream=ndjson).
+
+Обычный list сначала загружает весь queryset со всеми prefetch, сериализует
+его целиком и только потом пишет ответ — для тысяч прошедших прогонов это
+заметная часть памяти воркера uWSGI. В потоковом режиме queryset читается
+через .iterator() пачками по stream_chunk_size строк (prefetch выполняется
+для каждой пачки отдельно), пачка сериализуется и сразу уходит клиенту,
+поэтому память не зависит от длины списка.
+
+    ?stream=json    — обычный JSON-массив, тот же, что и без stream
+    ?stream=ndjson  — по одному объекту JSON в строке (application/x-ndjson)
+
+Потоковый ответ всегда в JSON (не columns/msgpack), не пагинируется
+и не попадает в общий кэш ответов; ETag и 304 работают как обычно.
+Ошибка посреди потока обрывает ответ: статус уже отправлен.
+"""
+import logging
+from itertools import islice
+
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import ValidationError
+
+from .renderers import FastJSONRenderer
+
+logger = logging.getLogger(__name__)
+
+STREAM_CONTENT_TYPES = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+
+_renderer = FastJSONRenderer()
+
+
+def iter_chunks(iterable, size):
+    """Списки по size элементов из итератора"""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def stream_items(chunks, stream_format):
+    """Байты JSON-массива или NDJSON из пачек уже сериализованных объектов"""
+    ndjson = stream_format == 'ndjson'
+    first = True
+    if not ndjson:
+        yield b'['
+    try:
+        for chunk in chunks:
+            parts = [_renderer.render(item) for item in chunk]
+            if not parts:
+                continue
+            if ndjson:
+                yield b'\n'.join(parts) + b'\n'
+            else:
+                yield (b'' if first else b',') + b','.join(parts)
+            first = False
+    except Exception:
+        # Заголовки уже отправлены: остаётся записать ошибку в лог и оборвать ответ
+        logger.exception('Ошибка при потоковой отдаче списка')
+        raise
+    if not ndjson:
+        yield b']'
+
+
+def streaming_response(chunks, stream_format):
+    return StreamingHttpResponse(stream_items(chunks, stream_format), content_type=STREAM_CONTENT_TYPES[stream_format])
+
+
+class StreamingListMixin:
+    """Добавляет к list потоковый режим ?stream=json|ndjson"""
+    stream_query_param = 'stream'
+    stream_chunk_size = 200
+
+    def get_stream_format(self):
+        """'json', 'ndjson' или None, если потоковый режим не запрошен (или список пагинируется)"""
+        value = self.request.query_params.get(self.stream_query_param)
+        if not value:
+            return None
+        if value not in STREAM_CONTENT_TYPES:
+            raise ValidationError({self.stream_query_param: 'Допустимые значения: json, ndjson'})
+        paginator = self.paginator
+        if paginator is not None and getattr(paginator, 'is_enabled', lambda request: True)(self.request):
+            return None
+        return value
+
+    def iter_serialized_chunks(self, queryset):
+        """Пачки сериализованных объектов; prefetch_related выполняется на каждую пачку"""
+        for chunk in iter_chunks(queryset.iterator(chunk_size=self.stream_chunk_size), self.stream_chunk_size):
+            yield self.get_serializer(chunk, many=True).data
+
+    def list(self, request, *args, **kwargs):
+        stream_format = self.get_stream_format()
+        if stream_format is None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        return streaming_response(self.iter_serialized_chunks(queryset), stream_format)
@@ -0,0 +1,230 @@
+"""
+Инкрементальная синхронизация по журналу auditlog (/api/sync/).
+
+Клиент, который держит у себя списки (SPA, офлайн-клиент), вместо повторной
+загрузки /api/runs/ и /api/convention-events/ целиком запрашивает изменения
+после своего курсора:
+
+    GET /api/sync/                                 — только текущий курсор
+    GET /api/sync/?since=<курсор>                  — изменения после курсора
+    GET /api/sync/?since=<курсор>&types=runs,games — только указанные типы
+
+    {"cursor": "...", "has_more": false,
+     "changed": {"runs": [{...}, ...], "convention-events": [...], ...},
+     "deleted": {"runs": [12, 15], ...}}
+
+Объекты в changed — в том же формате, что и в списках API (тот же viewset и
+сериализатор), deleted — id удалённых объектов. Изменённым считается и
+объект, вложенные данные которого поменялись: прогон — при изменении игры,
+помещения или регистрации на него (счётчики регистраций в журнал не пишутся).
+
+Курсор — непрозрачная строка, внутри — id записи журнала; id растут
+монотонно. Транзакция с меньшим id может зафиксироваться позже большего,
+поэтому курсор отстаёт от последних SYNC_LAG секунд журнала: свежие
+изменения приходят повторно, а клиент просто перезаписывает объекты.
+Если изменений больше MAX_ENTRIES записей журнала, ответ содержит
+has_more=true, и следующий запрос продолжает с нового курсора.
+
+Начальная загрузка: сначала получить курсор (без since), затем загрузить
+списки как обычно и дальше синхронизироваться с этого курсора.
+"""
+import base64
+import json
+from collections import defaultdict
+from datetime import timedelta
+
+from auditlog.models import LogEntry
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Max, Q
+from django.utils import timezone
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+
+from .models import (
+    City, CommonEvent, Convention, ConventionEvent, ConventionEventRegistration, ConventionLink, Game,
+    Region, Registration, Room, Run, Venue,
+)
+from .views import (
+    CityViewSet, ConventionEventViewSet, ConventionViewSet, GameViewSet, RoomViewSet, RunViewSet, VenueViewSet,
+)
+
+# Сколько записей журнала обрабатывается за один запрос
+MAX_ENTRIES = 1000
+
+# Курсор не продвигается дальше записей моложе этого интервала
+SYNC_LAG = timedelta(seconds=10)
+
+# Тип → (viewset, зависимости: модель вложенных данных → (путь от объекта типа, поле FK на объект типа))
+# Поле FK нужно, чтобы найти объект по записи журнала об удалённой вложенной строке.
+SYNC_TYPES = {
+    'runs': (RunViewSet, {
+        Game: ('game', None),
+        City: ('city', None),
+        ConventionEvent: ('convention_event', None),
+        Convention: ('convention_event__convention', None),
+        Room: ('rooms', None),
+        Venue: ('rooms__venue', None),
+        Registration: ('registrations', 'run'),
+    }),
+    'convention-events': (ConventionEventViewSet, {
+        Convention: ('convention', None),
+        ConventionLink: ('convention__links', None),
+        City: ('city', None),
+        Region: ('city__region', None),
+        Venue: ('venue', None),
+        Run: ('scheduled_runs', 'convention_event'),
+        Game: ('scheduled_runs__game', None),
+        CommonEvent: ('common_events', 'convention_event'),
+        ConventionEventRegistration: ('event_registrations', 'convention_event'),
+    }),
+    'games': (GameViewSet, {}),
+    'conventions': (ConventionViewSet, {
+        ConventionEvent: ('events', 'convention'),
+        ConventionLink: ('links', 'convention'),
+    }),
+    'cities': (CityViewSet, {
+        Region: ('region', None),
+    }),
+    'venues': (VenueViewSet, {
+        City: ('city', None),
+        Room: ('rooms', 'venue'),
+    }),
+    'rooms': (RoomViewSet, {
+        Venue: ('venue', None),
+    }),
+}
+
+
+def encode_cursor(log_id):
+    raw = json.dumps({'log': log_id})
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(encoded):
+    try:
+        log_id = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))['log']
+        return max(int(log_id), 0)
+    except Exception:
+        raise ValidationError({'since': 'Неверный курсор'})
+
+
+def get_types(query_params):
+    raw = query_params.get('types')
+    if not raw:
+        return list(SYNC_TYPES)
+    types = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in types if name not in SYNC_TYPES]
+    if unknown:
+        raise ValidationError({'types': f'Неизвестные типы: {", ".join(unknown)}. Допустимые: {", ".join(SYNC_TYPES)}'})
+    return types
+
+
+def get_lagged_cursor(since):
+    """Курсор по журналу, отстающий на SYNC_LAG (не меньше since)"""
+    last_id = LogEntry.objects.filter(timestamp__lt=timezone.now() - SYNC_LAG).aggregate(last_id=Max('id'))['last_id']
+    return max(last_id or 0, since)
+
+
+def get_type_model(viewset):
+    return viewset.serializer_class.Meta.model
+
+
+def parse_pk(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def get_fk_values(changes, field_name):
+    """id из изменения FK-поля в записи журнала: {"run": ["3", "4"]} → {3, 4}"""
+    values = (changes or {}).get(field_name)
+    if not isinstance(values, list):
+        return set()
+    return {pk for pk in map(parse_pk, values) if pk is not None}
+
+
+def collect_changes(entries, models_by_content_type, types):
+    """
+    По записям журнала — для каждого типа множества id изменённых объектов
+    и id объектов, удаление которых записано в журнал.
+    """
+    touched = defaultdict(set)
+    deleted = defaultdict(set)
+    for entry in entries:
+        model = models_by_content_type[entry['content_type_id']]
+        pk = parse_pk(entry['object_pk'])
+        if pk is None:
+            continue
+        touched[model].add(pk)
+        if entry['action'] == LogEntry.Action.DELETE:
+            deleted[model].add(pk)
+
+    changed_ids = {}
+    deleted_ids = {}
+    for name in types:
+        viewset, dependencies = SYNC_TYPES[name]
+        model = get_type_model(viewset)
+        ids = set(touched.get(model, ()))
+        condition = Q()
+        for dependency, (lookup, fk_name) in dependencies.items():
+            if dependency not in touched:
+                continue
+            condition |= Q(**{f'{lookup}__in': touched[dependency]})
+            if fk_name:
+                # Вложенная строка могла быть удалена или перенесена: её прежний родитель есть только в журнале
+                for entry in entries:
+                    if models_by_content_type[entry['content_type_id']] is dependency:
+                        ids |= get_fk_values(entry['changes'], fk_name)
+        if condition:
+            ids |= set(model.objects.filter(condition).values_list('pk', flat=True).distinct())
+        changed_ids[name] = ids
+        deleted_ids[name] = deleted.get(model, set())
+    return changed_ids, deleted_ids
+
+
+def serialize(request, viewset_class, ids):
+    """Объекты с указанными id в формате списка viewset"""
+    view = viewset_class(request=request, format_kwarg=None, args=(), kwargs={}, action='list')
+    queryset = view.get_queryset().filter(pk__in=ids)
+    return view.get_serializer(queryset, many=True).data
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def sync(request):
+    """Изменённые и удалённые объекты после курсора ?since= (см. описание модуля)"""
+    types = get_types(request.query_params)
+    raw_since = request.query_params.get('since')
+    if not raw_since:
+        return Response({'cursor': encode_cursor(get_lagged_cursor(0)), 'has_more': False, 'changed': {}, 'deleted': {}})
+    since = decode_cursor(raw_since)
+
+    models = set()
+    for name in types:
+        viewset, dependencies = SYNC_TYPES[name]
+        models.add(get_type_model(viewset))
+        models.update(dependencies)
+    content_types = ContentType.objects.get_for_models(*models)
+    models_by_content_type = {content_type.pk: model for model, content_type in content_types.items()}
+
+    entries = list(LogEntry.objects.filter(
+        id__gt=since, content_type__in=content_types.values()
+    ).order_by('id').values('id', 'content_type_id', 'object_pk', 'action', 'changes')[:MAX_ENTRIES + 1])
+    has_more = len(entries) > MAX_ENTRIES
+    entries = entries[:MAX_ENTRIES]
+    # При has_more продолжаем строго после обработанных записей, иначе — с отставанием на SYNC_LAG
+    cursor = entries[-1]['id'] if has_more else get_lagged_cursor(since)
+
+    changed_ids, deleted_ids = collect_changes(entries, models_by_content_type, types)
+    changed = {}
+    deleted = {}
+    for name in types:
+        viewset, _ = SYNC_TYPES[name]
+        changed[name] = serialize(request, viewset, changed_ids[name]) if changed_ids[name] else []
+        # Удалённым считается объект, удаление которого есть в журнале и которого больше нет
+        existing = set(get_type_model(viewset).objects.filter(pk__in=deleted_ids[name]).values_list('pk', flat=True))
+        deleted[name] = sorted(deleted_ids[name] - existing)
+    return Response({'cursor': encode_cursor(cursor), 'has_more': has_more, 'changed': changed, 'deleted': deleted})
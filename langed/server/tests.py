@@ -1,3 +1,397 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from . import sync
+from .models import City, Convention, ConventionEvent, ConventionEventRegistration, Game, Registration, Run
+
+User = get_user_model()
+
+
+def create_users(count):
+    return [User.objects.create_user(f'user{i}', f'user{i}@example.com') for i in range(count)]
+
+
+class RunRegistrationCountersTests(TestCase):
+    """Счётчики регистраций прогона (Run.players_count и др.) при изменении регистраций"""
+
+    def setUp(self):
+        self.users = create_users(6)
+        self.city = City.objects.create(name='Екатеринбург')
+        self.game = Game.objects.create(name='Игра', players_max=10)
+        self.run = Run.objects.create(game=self.game, city=self.city, date=timezone.now() + timedelta(days=7))
+
+    def register(self, user, status='confirmed', is_technician=False, run=None):
+        return Registration.objects.create(
+            run=run or self.run, user=user, status=status, is_technician=is_technician
+        )
+
+    def assertCounters(self, run, players=0, technicians=0, waitlist=0, confirmed=0):
+        run.refresh_from_db()
+        self.assertEqual(
+            (run.players_count, run.technicians_count, run.waitlist_count, run.confirmed_count),
+            (players, technicians, waitlist, confirmed),
+        )
+
+    def test_create(self):
+        self.register(self.users[0], 'confirmed')
+        self.register(self.users[1], 'pending')
+        self.register(self.users[2], 'waitlist')
+        self.register(self.users[3], 'cancelled')
+        self.register(self.users[4], 'confirmed', is_technician=True)
+        self.assertCounters(self.run, players=2, technicians=1, waitlist=1, confirmed=1)
+
+    def test_status_change(self):
+        pending = self.register(self.users[0], 'pending')
+        waitlist = self.register(self.users[1], 'waitlist')
+        confirmed = self.register(self.users[2], 'confirmed')
+
+        pending.status = 'confirmed'
+        pending.save()
+        self.assertCounters(self.run, players=2, waitlist=1, confirmed=2)
+
+        waitlist.status = 'pending'
+        waitlist.save()
+        confirmed.status = 'cancelled'
+        confirmed.save()
+        self.assertCounters(self.run, players=2, confirmed=1)
+
+        pending.is_technician = True
+        pending.save(update_fields=['is_technician'])
+        self.assertCounters(self.run, players=1, technicians=1)
+
+    def test_repeated_save_does_not_change_counters(self):
+        registration = self.register(self.users[0], 'confirmed')
+        registration.comment = 'Буду'
+        registration.save()
+        registration.save()
+        self.assertCounters(self.run, players=1, confirmed=1)
+
+    def test_move_to_another_run(self):
+        other_run = Run.objects.create(game=self.game, city=self.city, date=timezone.now() + timedelta(days=8))
+        registration = self.register(self.users[0], 'confirmed')
+        registration.run = other_run
+        registration.save()
+        self.assertCounters(self.run)
+        self.assertCounters(other_run, players=1, confirmed=1)
+
+    def test_delete(self):
+        confirmed = self.register(self.users[0], 'confirmed')
+        waitlist = self.register(self.users[1], 'waitlist')
+        self.register(self.users[2], 'pending', is_technician=True)
+        confirmed.delete()
+        waitlist.delete()
+        self.assertCounters(self.run, technicians=1)
+
+    def test_queryset_delete(self):
+        self.register(self.users[0], 'confirmed')
+        self.register(self.users[1], 'pending')
+        self.register(self.users[2], 'waitlist')
+        Registration.objects.filter(status__in=['confirmed', 'waitlist']).delete()
+        self.assertCounters(self.run, players=1)
+
+    def test_cascade_delete_user(self):
+        self.register(self.users[0], 'confirmed')
+        self.register(self.users[1], 'waitlist')
+        self.users[0].delete()
+        self.assertCounters(self.run, waitlist=1)
+
+    def test_reconcile_command_repairs_drift(self):
+        self.register(self.users[0], 'confirmed')
+        self.register(self.users[1], 'waitlist')
+        self.register(self.users[2], 'confirmed', is_technician=True)
+        # Изменения в обход save() не обновляют счётчики
+        Registration.objects.filter(user=self.users[1]).update(status='pending')
+        Run.objects.filter(pk=self.run.pk).update(technicians_count=5)
+
+        call_command('reconcile_run_counters', dry_run=True, stdout=StringIO())
+        self.assertCounters(self.run, players=1, technicians=5, waitlist=1, confirmed=1)
+
+        call_command('reconcile_run_counters', stdout=StringIO())
+        self.assertCounters(self.run, players=2, technicians=1, confirmed=1)
+
+
+class ConventionEventRegistrationCountersTests(TestCase):
+    """Счётчики регистраций проведения (ConventionEvent.*_registrations_count) при изменении регистраций"""
+
+    def setUp(self):
+        self.users = create_users(4)
+        self.city = City.objects.create(name='Екатеринбург')
+        self.convention = Convention.objects.create(name='Конвент')
+        self.event = self.create_event()
+
+    def create_event(self):
+        return ConventionEvent.objects.create(
+            convention=self.convention, city=self.city, date_start=date.today(), date_end=date.today(),
+        )
+
+    def register(self, user, status='pending', event=None):
+        return ConventionEventRegistration.objects.create(convention_event=event or self.event, user=user, status=status)
+
+    def assertCounters(self, event, confirmed=0, pending=0):
+        event.refresh_from_db()
+        self.assertEqual(
+            (event.confirmed_registrations_count, event.pending_registrations_count), (confirmed, pending)
+        )
+
+    def test_create_and_status_change(self):
+        first = self.register(self.users[0], 'pending')
+        self.register(self.users[1], 'confirmed')
+        self.register(self.users[2], 'rejected')
+        self.assertCounters(self.event, confirmed=1, pending=1)
+
+        first.status = 'confirmed'
+        first.save()
+        self.assertCounters(self.event, confirmed=2)
+
+        first.status = 'cancelled'
+        first.save(update_fields=['status'])
+        self.assertCounters(self.event, confirmed=1)
+
+    def test_move_to_another_event(self):
+        other_event = self.create_event()
+        registration = self.register(self.users[0], 'confirmed')
+        registration.convention_event = other_event
+        registration.save()
+        self.assertCounters(self.event)
+        self.assertCounters(other_event, confirmed=1)
+
+    def test_delete_and_cascade_delete(self):
+        confirmed = self.register(self.users[0], 'confirmed')
+        self.register(self.users[1], 'pending')
+        self.register(self.users[2], 'pending')
+        confirmed.delete()
+        self.assertCounters(self.event, pending=2)
+        self.users[1].delete()
+        self.assertCounters(self.event, pending=1)
+
+    def test_reconcile_command_repairs_drift(self):
+        self.register(self.users[0], 'confirmed')
+        self.register(self.users[1], 'pending')
+        ConventionEventRegistration.objects.filter(user=self.users[1]).update(status='confirmed')
+        ConventionEvent.objects.filter(pk=self.event.pk).update(confirmed_registrations_count=9)
+
+        call_command('reconcile_convention_event_counters', dry_run=True, stdout=StringIO())
+        self.assertCounters(self.event, confirmed=9, pending=1)
+
+        call_command('reconcile_convention_event_counters', stdout=StringIO())
+        self.assertCounters(self.event, confirmed=2)
+
+
+@override_settings(RESPONSE_CACHE_ALIAS=None)
+class KeysetPaginationTests(TestCase):
+    """Keyset-пагинация: проход по страницам через next даёт тот же список, что и без пагинации"""
+
+    def setUp(self):
+        self.client = APIClient()
+        city = City.objects.create(name='Екатеринбург')
+        game = Game.objects.create(name='Игра')
+        now = timezone.now()
+        # Несколько прогонов в одно время: порядок внутри них задаёт id
+        dates = [now + timedelta(days=day) for day in (1, 2, 2, 2, 3, 5, 8)]
+        dates += [now - timedelta(days=day) for day in (1, 4, 4, 6)]
+        for run_date in dates:
+            Run.objects.create(game=game, city=city, date=run_date)
+
+    def collect_pages(self, url):
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            ids += [item['id'] for item in data['results']]
+            url = data['next']
+            pages += 1
+        return ids, pages
+
+    def assertPagesMatchList(self, path):
+        expected = [item['id'] for item in self.client.get(path).json()]
+        ids, pages = self.collect_pages(f'{path}&page_size=2')
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, (len(expected) + 1) // 2)
+
+    def test_ascending_with_equal_keys(self):
+        self.assertPagesMatchList('/api/runs/?time=upcoming')
+
+    def test_descending(self):
+        self.assertPagesMatchList('/api/runs/?time=past')
+
+    def test_cursor_round_trip(self):
+        first = self.client.get('/api/runs/?time=upcoming&page_size=3').json()
+        second = self.client.get(first['next']).json()
+        # Тот же курсор даёт ту же страницу
+        self.assertEqual(self.client.get(first['next']).json(), second)
+        self.assertFalse({item['id'] for item in first['results']} & {item['id'] for item in second['results']})
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/runs/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(RESPONSE_CACHE_ALIAS=None)
+@mock.patch.object(sync, 'SYNC_LAG', timedelta(0))
+class SyncTests(TestCase):
+    """Инкрементальная синхронизация /api/sync/ по журналу auditlog"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_users(1)[0]
+        self.city = City.objects.create(name='Екатеринбург')
+        self.game = Game.objects.create(name='Игра')
+        self.runs = [
+            Run.objects.create(game=self.game, city=self.city, date=timezone.now() + timedelta(days=day))
+            for day in (1, 2)
+        ]
+        # mock.patch на классе не действует в setUp
+        with mock.patch.object(sync, 'SYNC_LAG', timedelta(0)):
+            self.cursor = self.client.get('/api/sync/').json()['cursor']
+
+    def sync(self, cursor=None, **params):
+        response = self.client.get('/api/sync/', {'since': cursor or self.cursor, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def rename_game(self):
+        # Сохранение без изменений auditlog не записывает
+        self.game.name = 'Новое название'
+        self.game.save()
+
+    def changed_ids(self, data, name):
+        return sorted(item['id'] for item in data['changed'][name])
+
+    def test_initial_request_returns_only_cursor(self):
+        data = self.client.get('/api/sync/').json()
+        self.assertEqual((data['changed'], data['deleted'], data['has_more']), ({}, {}, False))
+        self.assertEqual(data['cursor'], self.cursor)
+
+    def test_no_changes(self):
+        data = self.sync()
+        self.assertEqual(data['cursor'], self.cursor)
+        self.assertTrue(all(not items for items in data['changed'].values()))
+
+    def test_changed_objects_and_dependents(self):
+        self.rename_game()
+        data = self.sync()
+        self.assertEqual(self.changed_ids(data, 'games'), [self.game.pk])
+        # Прогоны содержат игру целиком и тоже считаются изменёнными
+        self.assertEqual(self.changed_ids(data, 'runs'), sorted(run.pk for run in self.runs))
+        self.assertEqual(data['changed']['runs'][0]['game']['name'], 'Новое название')
+
+        # С нового курсора изменений нет
+        self.assertEqual(self.changed_ids(self.sync(data['cursor']), 'games'), [])
+
+    def test_deleted_registration_marks_run_changed(self):
+        registration = Registration.objects.create(run=self.runs[0], user=self.user, status='confirmed')
+        cursor = self.sync()['cursor']
+        registration.delete()
+        data = self.sync(cursor)
+        self.assertEqual(self.changed_ids(data, 'runs'), [self.runs[0].pk])
+
+    def test_tombstones(self):
+        run_id = self.runs[1].pk
+        self.runs[1].delete()
+        data = self.sync()
+        self.assertEqual(data['deleted']['runs'], [run_id])
+        self.assertNotIn(run_id, self.changed_ids(data, 'runs'))
+
+    def test_types_filter(self):
+        self.rename_game()
+        data = self.sync(types='games')
+        self.assertEqual(list(data['changed']), ['games'])
+
+    def test_has_more_continues_from_cursor(self):
+        for run in self.runs:
+            run.duration += 30
+            run.save()
+        self.rename_game()
+        with mock.patch.object(sync, 'MAX_ENTRIES', 1):
+            cursor, cursors, changed = self.cursor, [], set()
+            while True:
+                data = self.sync(cursor, types='runs')
+                changed |= set(self.changed_ids(data, 'runs'))
+                cursors.append(sync.decode_cursor(data['cursor']))
+                cursor = data['cursor']
+                if not data['has_more']:
+                    break
+        self.assertEqual(cursors, sorted(set(cursors)))
+        self.assertEqual(changed, {run.pk for run in self.runs})
+
+    def test_cursor_lags_behind_recent_entries(self):
+        self.rename_game()
+        with mock.patch.object(sync, 'SYNC_LAG', timedelta(hours=1)):
+            data = self.sync()
+        # Свежие изменения приходят, но курсор не продвигается: они придут и в следующий раз
+        self.assertEqual(self.changed_ids(data, 'games'), [self.game.pk])
+        self.assertEqual(data['cursor'], self.cursor)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get('/api/sync/', {'since': 'not-a-cursor'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/sync/', {'since': self.cursor, 'types': 'unknown'}).status_code, 400)
+
+
+class PosterVariantsTests(TestCase):
+    """Копии постеров игр создаются и удаляются только после коммита"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.game = Game.objects.create(name='Игра')
+
+    def poster(self, name='poster.jpg'):
+        content = BytesIO()
+        Image.new('RGB', (800, 600), (200, 10, 10)).save(content, 'JPEG')
+        return SimpleUploadedFile(name, content.getvalue())
+
+    def variant_paths(self, game):
+        return [
+            os.path.join(self.media_root, name)
+            for sizes in (game.poster_variants.get('webp', {}), game.poster_variants.get('jpeg', {}))
+            for name in sizes.values()
+        ]
+
+    def test_variants_created_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.game.poster = self.poster()
+            self.game.save()
+            self.game.refresh_from_db()
+            self.assertEqual(self.game.poster_variants, {})
+        self.game.refresh_from_db()
+        paths = self.variant_paths(self.game)
+        self.assertTrue(paths)
+        self.assertTrue(all(os.path.exists(path) for path in paths))
+
+    def test_rollback_leaves_no_variants(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.game.poster = self.poster()
+                self.game.save()
+                raise RuntimeError
+        self.assertEqual(callbacks, [])
+        files = os.listdir(os.path.join(self.media_root, 'games', 'posters'))
+        self.assertEqual(files, ['poster.jpg'])
+
+    def test_delete_removes_variants_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.game.poster = self.poster()
+            self.game.save()
+        self.game.refresh_from_db()
+        paths = self.variant_paths(self.game)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.game.delete()
+            self.assertTrue(all(os.path.exists(path) for path in paths))
+        self.assertFalse(any(os.path.exists(path) for path in paths))
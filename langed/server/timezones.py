@@ -0,0 +1,73 @@
+"""
+Перевод дат между UTC и локальным временем городов.
+
+Даты хранятся в UTC, а показываются и вводятся в таймзоне города
+(City.timezone). Объекты таймзон создаются один раз на имя и кэшируются;
+для списков локальное время считается пачкой, сгруппированной по таймзоне.
+"""
+from datetime import timezone as dt_timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# Таймзона по умолчанию, если у города она не задана или неизвестна
+DEFAULT_TIMEZONE = 'Europe/Moscow'
+
+
+@lru_cache(maxsize=None)
+def get_timezone(name):
+    """Возвращает таймзону по имени или None, если имя пустое или неизвестное"""
+    if not name:
+        return None
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+def _format_local(value, tz):
+    return value.astimezone(tz).replace(tzinfo=None, microsecond=0).isoformat()
+
+
+def to_local_iso(value, timezone_name):
+    """
+    Дата в локальном времени города без таймзоны ('2026-01-15T14:00:00').
+    Если таймзона не задана или неизвестна, возвращает дату в ISO как есть.
+    """
+    if value is None:
+        return None
+    tz = get_timezone(timezone_name)
+    if tz is None:
+        return value.isoformat()
+    return _format_local(value, tz)
+
+
+def to_local_iso_many(items):
+    """
+    Пакетный вариант to_local_iso: принимает пары (дата, имя таймзоны)
+    и возвращает список строк в том же порядке.
+    """
+    items = list(items)
+    result = [None] * len(items)
+    groups = {}
+    for index, (value, timezone_name) in enumerate(items):
+        if value is not None:
+            groups.setdefault(timezone_name, []).append(index)
+
+    for timezone_name, indexes in groups.items():
+        tz = get_timezone(timezone_name)
+        for index in indexes:
+            value = items[index][0]
+            result[index] = value.isoformat() if tz is None else _format_local(value, tz)
+    return result
+
+
+def local_to_utc(value, timezone_name):
+    """
+    Переводит дату без таймзоны, введённую как локальное время города, в UTC.
+    Даты с таймзоной возвращаются как есть; без известной таймзоны города
+    используется DEFAULT_TIMEZONE.
+    """
+    if value is None or (value.tzinfo is not None and value.utcoffset() is not None):
+        return value
+    tz = get_timezone(timezone_name) or get_timezone(DEFAULT_TIMEZONE)
+    return value.replace(tzinfo=tz).astimezone(dt_timezone.utc)
@@ -1,5 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import ics, sync
 from .views import (
     GameViewSet, RunViewSet, ConventionViewSet, ConventionEventViewSet,
     CityViewSet, ConventionLinkViewSet, VenueViewSet, RoomViewSet, 
@@ -21,4 +22,8 @@ urlpatterns = [
     path('auth/user/', current_user, name='current-user'),
     path('auth/urls/', auth_urls, name='auth-urls'),
     path('users/search/', search_users, name='search-users'),
+    path('sync/', sync.sync, name='sync'),
+    path('calendar/cities/<int:city_id>.ics', ics.city_calendar, name='calendar-city'),
+    path('calendar/convention-events/<int:event_id>.ics', ics.convention_event_calendar, name='calendar-convention-event'),
+    path('calendar/users/<str:token>.ics', ics.user_calendar, name='calendar-user'),
 ]
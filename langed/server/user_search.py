@@ -0,0 +1,85 @@
+"""
+Поиск пользователей для автодополнения мастеров, организаторов и создателей.
+
+Поиск идёт по одной нормализованной строке
+lower(username || ' ' || first_name || ' ' || last_name || ' ' || email).
+На PostgreSQL по этому выражению построен триграммный GIN-индекс
+(миграция 0025), поэтому `LIKE '%запрос%'` не сканирует всю таблицу.
+Совпадения с начала логина, имени или фамилии показываются первыми.
+На SQLite индекса нет, а lower() не переводит кириллицу в нижний регистр.
+
+Результаты кэшируются на короткое время; при изменении или удалении
+пользователя версия ключей кэша меняется, и старые ответы перестают использоваться.
+"""
+import hashlib
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Case, IntegerField, Q, TextField, Value, When
+from django.db.models.functions import Concat, Lower
+
+SEARCH_RESULTS_LIMIT = 10
+SEARCH_CACHE_TIMEOUT = 5 * 60
+SEARCH_CACHE_VERSION_KEY = 'user_search:version'
+
+
+def user_search_expression():
+    """Нормализованная строка поиска; должна совпадать с выражением индекса в миграции 0025"""
+    return Lower(Concat(
+        'username', Value(' '), 'first_name', Value(' '), 'last_name', Value(' '), 'email',
+        output_field=TextField(),
+    ))
+
+
+def get_display_name(user):
+    display_name = f'{user.first_name} {user.last_name}'.strip()
+    return display_name or user.username
+
+
+def find_users(query):
+    """Ищет пользователей по подстроке; сначала совпадения с начала логина, имени или фамилии"""
+    User = get_user_model()
+    query = query.lower()
+    users = User.objects.annotate(
+        search_text=user_search_expression(),
+        search_rank=Case(
+            When(username__istartswith=query, then=Value(0)),
+            When(Q(first_name__istartswith=query) | Q(last_name__istartswith=query), then=Value(1)),
+            default=Value(2),
+            output_field=IntegerField(),
+        ),
+    ).filter(search_text__contains=query).order_by('search_rank', 'username').only(
+        'id', 'username', 'first_name', 'last_name', 'email'
+    )[:SEARCH_RESULTS_LIMIT]
+
+    return [
+        {
+            'id': user.id,
+            'username': user.username,
+            'display_name': get_display_name(user),
+            'email': user.email,
+        }
+        for user in users
+    ]
+
+
+def get_cache_key(query):
+    version = cache.get_or_set(SEARCH_CACHE_VERSION_KEY, time.time_ns, None)
+    digest = hashlib.md5(query.lower().encode('utf-8'), usedforsecurity=False).hexdigest()
+    return f'user_search:{version}:{digest}'
+
+
+def search_users(query):
+    """Результаты поиска пользователей с кэшированием по запросу"""
+    key = get_cache_key(query)
+    results = cache.get(key)
+    if results is None:
+        results = find_users(query)
+        cache.set(key, results, SEARCH_CACHE_TIMEOUT)
+    return results
+
+
+def invalidate_user_search():
+    """Сбрасывает кэш поиска пользователей (новая версия ключей)"""
+    cache.set(SEARCH_CACHE_VERSION_KEY, time.time_ns(), None)
@@ -2,6 +2,7 @@ import csv
 import io
 from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
@@ -11,12 +12,27 @@ from datetime import date
 
 from django.db.models import Prefetch
 from .models import Game, Run, Convention, ConventionEvent, City, ConventionLink, Venue, Room, Registration, Region, CommonEvent, ConventionEventRegistration
+from .batch import BatchFetchMixin
+from .conditional import ConditionalGetMixin
+from .date_range import (
+    build_event_calendar, build_run_calendar, filter_events_by_range, filter_runs_by_range,
+    get_city_id, get_date_range,
+)
+from .feed import build_run_feed, iter_run_feed_chunks
+from .ics import get_user_calendar_url
+from .pagination import KeysetPagination
+from .response_cache import ResponseCacheMixin
+from .sparse import SparseFieldsViewMixin
+from .streaming import StreamingListMixin, streaming_response
+from .schedule import get_schedule_document, personalize_schedule
+from .search import search_games
+from . import user_search
 from .serializers import (
     GameSerializer, RunSerializer, 
     ConventionSerializer, ConventionEventSerializer,
     CitySerializer, ConventionLinkSerializer,
     VenueSerializer, RoomSerializer, RegistrationSerializer,
-    ConventionScheduleSerializer, ScheduleRunSerializer,
+    ScheduleRunSerializer,
     CommonEventSerializer, ConventionEventRegistrationSerializer,
     ConventionEventRegistrationBriefSerializer
 )
@@ -40,6 +56,7 @@ def current_user(request):
             'last_name': request.user.last_name,
             'display_name': display_name,
             'is_staff': request.user.is_staff,
+            'calendar_url': get_user_calendar_url(request, request.user),
         })
     return Response({
         'is_authenticated': False,
@@ -53,37 +70,8 @@ def search_users(request):
     query = request.query_params.get('q', '').strip()
     if len(query) < 2:
         return Response([])
-    
-    from django.contrib.auth import get_user_model
-    from django.db.models import Q, Value, CharField
-    from django.db.models.functions import Concat
-    
-    User = get_user_model()
-    
-    # Ищем по username, first_name, last_name и email
-    users = User.objects.annotate(
-        full_name=Concat('first_name', Value(' '), 'last_name', output_field=CharField())
-    ).filter(
-        Q(username__icontains=query) |
-        Q(first_name__icontains=query) |
-        Q(last_name__icontains=query) |
-        Q(email__icontains=query) |
-        Q(full_name__icontains=query)
-    ).distinct()[:10]
-    
-    results = []
-    for user in users:
-        display_name = f'{user.first_name} {user.last_name}'.strip()
-        if not display_name:
-            display_name = user.username
-        results.append({
-            'id': user.id,
-            'username': user.username,
-            'display_name': display_name,
-            'email': user.email,
-        })
-    
-    return Response(results)
+
+    return Response(user_search.search_users(query))
 
 
 @api_view(['GET'])
@@ -96,10 +84,11 @@ def auth_urls(request):
     })
 
 
-class CityViewSet(viewsets.ModelViewSet):
+class CityViewSet(ResponseCacheMixin, SparseFieldsViewMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     """API для городов"""
     queryset = City.objects.all()
     serializer_class = CitySerializer
+    conditional_models = (Region,)
     
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
@@ -107,10 +96,15 @@ class CityViewSet(viewsets.ModelViewSet):
         return [AllowAny()]
 
 
-class GameViewSet(viewsets.ModelViewSet):
-    """API для игр (просмотр, создание, редактирование)"""
+class GameViewSet(
+    ResponseCacheMixin, BatchFetchMixin, SparseFieldsViewMixin, ConditionalGetMixin, StreamingListMixin,
+    viewsets.ModelViewSet
+):
+    """API для игр (просмотр, создание, редактирование, поиск через ?search=)"""
     queryset = Game.objects.all()
     serializer_class = GameSerializer
+    pagination_class = KeysetPagination
+    keyset_field = 'created_at'
     
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy', 'import_csv']:
@@ -118,6 +112,23 @@ class GameViewSet(viewsets.ModelViewSet):
             return [IsAuthenticated()]
         return [AllowAny()]
     
+    def get_queryset(self):
+        fields = self.get_field_selection()
+        queryset = super().get_queryset()
+        if fields.includes('creators'):
+            queryset = queryset.prefetch_related('creators')
+        # Длинные тексты и поисковый вектор не загружаем, если они не нужны в ответе
+        deferred = ['search_vector'] + [name for name in ('announcement', 'red_flags') if not fields.includes(name)]
+        queryset = queryset.defer(*deferred)
+        
+        search = self.request.query_params.get('search', '').strip()
+        if search:
+            # Keyset-пагинация сортирует по created_at и потеряла бы порядок по релевантности
+            if self.action == 'list' and self.paginator is not None and self.paginator.is_enabled(self.request):
+                raise ValidationError({'search': 'Поиск не поддерживает постраничную загрузку (page_size, cursor)'})
+            queryset = search_games(queryset, search)
+        return queryset
+    
     def check_object_permissions(self, request, obj):
         """Проверяем, что пользователь — создатель игры или staff"""
         super().check_object_permissions(request, obj)
@@ -246,9 +257,16 @@ class GameViewSet(viewsets.ModelViewSet):
             )
 
 
-class RunViewSet(viewsets.ModelViewSet):
+class RunViewSet(
+    ResponseCacheMixin, BatchFetchMixin, SparseFieldsViewMixin, ConditionalGetMixin, StreamingListMixin,
+    viewsets.ModelViewSet
+):
     """API для прогонов (просмотр, создание, редактирование)"""
     serializer_class = RunSerializer
+    pagination_class = KeysetPagination
+    keyset_field = 'date'
+    conditional_models = (Game, City, Room, Venue, ConventionEvent, Convention, Registration)
+    response_cache_actions = ('list', 'retrieve', 'feed', 'calendar')
     
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
@@ -264,15 +282,60 @@ class RunViewSet(viewsets.ModelViewSet):
                 raise PermissionDenied('Только мастер прогона может его редактировать')
     
     def get_queryset(self):
+        fields = self.get_field_selection()
+        
+        # Счётчики регистраций хранятся в полях прогона и не требуют COUNT
         queryset = Run.objects.select_related(
             'game', 'city', 'convention_event', 'convention_event__convention'
-        ).prefetch_related('masters', 'rooms', 'rooms__venue', 'registrations', 'registrations__user').all()
+        )
         
+        # Загружаем только то, что попадёт в ответ (?fields=, ?expand=)
+        prefetches = []
+        if fields.includes('masters'):
+            prefetches.append('masters')
+        if fields.includes('rooms') or fields.includes('venue_name'):
+            prefetches += ['rooms', 'rooms__venue']
+        if fields.includes('registrations'):
+            prefetches += ['registrations', 'registrations__user']
+        if fields.includes('game.creators'):
+            prefetches.append('game__creators')
+        queryset = queryset.prefetch_related(*prefetches)
+        
+        deferred = ['game__search_vector'] + [
+            f'game__{name}' for name in ('announcement', 'red_flags')
+            if not fields.includes(f'game.{name}')
+        ]
+        queryset = queryset.defer(*deferred)
+        
+        # Регистрация текущего пользователя подгружается одним запросом на весь список
+        if self.request.user.is_authenticated and fields.includes('current_user_registration'):
+            queryset = queryset.prefetch_related(Prefetch(
+                'registrations',
+                queryset=Registration.objects.filter(user=self.request.user).select_related('user'),
+                to_attr='current_user_registrations'
+            ))
+        
+        return self.filter_runs(queryset)
+    
+    def get_conditional_queryset(self):
+        # Для ETag достаточно отфильтрованных прогонов без аннотаций и prefetch
+        return self.filter_runs(Run.objects.all())
+    
+    def filter_runs(self, queryset):
+        """Применяет фильтры из параметров запроса"""
         # Фильтр по городу
         city = self.request.query_params.get('city')
         if city:
             queryset = queryset.filter(city__name__iexact=city)
         
+        # Фильтр по id города и диапазону местных дат (?from=&to=), см. date_range.py
+        city_id = get_city_id(self.request.query_params)
+        date_range = get_date_range(self.request.query_params, required=self.action == 'calendar')
+        if date_range:
+            queryset = filter_runs_by_range(queryset, date_range, city_id)
+        elif city_id is not None:
+            queryset = queryset.filter(city_id=city_id)
+        
         # Фильтр по времени: upcoming (предстоящие) или past (прошедшие)
         time_filter = self.request.query_params.get('time')
         if time_filter == 'upcoming':
@@ -282,6 +345,8 @@ class RunViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(date__lt=timezone.now())
             return queryset.order_by('-date')  # Недавно прошедшие первыми
         
+        if date_range:
+            return queryset.order_by('date')  # Календарный порядок
         return queryset.order_by('-date')
     
     @action(detail=False, methods=['get'])
@@ -291,12 +356,44 @@ class RunViewSet(viewsets.ModelViewSet):
             runs__isnull=False
         ).distinct().values_list('name', flat=True).order_by('name')
         return Response(list(cities))
-    
+
+    @action(detail=False, methods=['get'])
+    def feed(self, request):
+        """
+        Лента прогонов для афиши: те же фильтры (city, time), что и у списка,
+        и тот же формат элементов, но без персональных полей.
+        Собирается через values() фиксированным числом запросов (на каждую пачку
+        в потоковом режиме ?stream=json|ndjson).
+        """
+        queryset = self.get_conditional_queryset()
+        stream_format = self.get_stream_format()
+
+        def render():
+            if stream_format is not None:
+                return streaming_response(iter_run_feed_chunks(queryset, self.stream_chunk_size), stream_format)
+            return Response(build_run_feed(queryset))
+
+        return self.cached_response(request, lambda: self.conditional_response(request, queryset, render))
+
+    @action(detail=False, methods=['get'])
+    def calendar(self, request):
+        """
+        Прогоны за диапазон ?from=&to= (обязательны), сгруппированные по местным дням
+        для месячного вида афиши; ?city_id= ограничивает город.
+        """
+        queryset = self.get_conditional_queryset()
+        date_range = get_date_range(request.query_params, required=True)
+        return self.cached_response(request, lambda: self.conditional_response(
+            request,
+            queryset,
+            lambda: Response(build_run_calendar(queryset, date_range))
+        ))
+
     def perform_create(self, serializer):
         """При создании прогона автоматически устанавливаем текущего пользователя как мастера"""
         run = serializer.save()
         run.masters.add(self.request.user)
-    
+
     @action(detail=True, methods=['post'])
     def add_master(self, request, pk=None):
         """Добавить мастера к прогону"""
@@ -407,6 +504,9 @@ class RunViewSet(viewsets.ModelViewSet):
             comment=comment
         )
         
+        # Перечитываем прогон, чтобы счётчики и список регистраций были актуальными
+        run = self.get_queryset().get(pk=run.pk)
+        
         return Response({
             'registration': RegistrationSerializer(registration, context={'request': request}).data,
             'run': RunSerializer(run, context={'request': request}).data
@@ -446,6 +546,8 @@ class RunViewSet(viewsets.ModelViewSet):
                 waitlist_registration.status = 'pending'
                 waitlist_registration.save()
         
+        run = self.get_queryset().get(pk=run.pk)
+        
         return Response({
             'message': 'Регистрация отменена',
             'run': RunSerializer(run, context={'request': request}).data
@@ -496,16 +598,19 @@ class RunViewSet(viewsets.ModelViewSet):
         registration.status = new_status
         registration.save()
         
+        run = self.get_queryset().get(pk=run.pk)
+        
         return Response({
             'registration': RegistrationSerializer(registration, context={'request': request}).data,
             'run': RunSerializer(run, context={'request': request}).data
         })
 
 
-class VenueViewSet(viewsets.ModelViewSet):
+class VenueViewSet(ResponseCacheMixin, SparseFieldsViewMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     """API для площадок"""
     queryset = Venue.objects.select_related('city').prefetch_related('rooms').all()
     serializer_class = VenueSerializer
+    conditional_models = (City, Region, Room)
     
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
@@ -523,10 +628,11 @@ class VenueViewSet(viewsets.ModelViewSet):
         return queryset.order_by('name')
 
 
-class RoomViewSet(viewsets.ModelViewSet):
+class RoomViewSet(ResponseCacheMixin, SparseFieldsViewMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     """API для помещений"""
     queryset = Room.objects.select_related('venue', 'venue__city').all()
     serializer_class = RoomSerializer
+    conditional_models = (Venue,)
     
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
@@ -549,10 +655,11 @@ class RoomViewSet(viewsets.ModelViewSet):
         return queryset.order_by('venue__name', 'name')
 
 
-class ConventionViewSet(viewsets.ModelViewSet):
+class ConventionViewSet(SparseFieldsViewMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     """API для конвентов (просмотр, создание, редактирование)"""
     serializer_class = ConventionSerializer
     queryset = Convention.objects.prefetch_related('events', 'organizers').all()
+    conditional_models = (ConventionEvent, ConventionLink)
     
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy', 'import_csv']:
@@ -712,9 +819,19 @@ class ConventionViewSet(viewsets.ModelViewSet):
             )
 
 
-class ConventionEventViewSet(viewsets.ModelViewSet):
+class ConventionEventViewSet(
+    ResponseCacheMixin, BatchFetchMixin, SparseFieldsViewMixin, ConditionalGetMixin, StreamingListMixin,
+    viewsets.ModelViewSet
+):
     """API для проведений конвентов (просмотр, создание, редактирование)"""
     serializer_class = ConventionEventSerializer
+    pagination_class = KeysetPagination
+    keyset_field = 'date_start'
+    conditional_models = (
+        Convention, ConventionLink, City, Region, Venue, Room, Run, Game, CommonEvent,
+        ConventionEventRegistration
+    )
+    response_cache_actions = ('list', 'retrieve', 'calendar')
     
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
@@ -733,23 +850,36 @@ class ConventionEventViewSet(viewsets.ModelViewSet):
                     raise PermissionDenied('Только организатор может редактировать проведение')
     
     def get_queryset(self):
-        # Используем явный Prefetch для надёжной загрузки прогонов и игр
-        runs_prefetch = Prefetch(
-            'scheduled_runs',
-            queryset=Run.objects.select_related('game').prefetch_related('masters', 'rooms')
-        )
+        fields = self.get_field_selection()
         
         queryset = ConventionEvent.objects.select_related(
             'convention', 'city', 'city__region', 'venue'
-        ).prefetch_related(
-            runs_prefetch,
-            'organizers',
-            'convention__organizers',
-            'convention__links',
-            'venue__rooms',
-            'common_events'
         )
         
+        # Загружаем только то, что попадёт в ответ (?fields=, ?expand=)
+        if fields.includes('runs') or fields.includes('games') or fields.includes('runs_count'):
+            # Для списка проведений нужны только краткие данные прогонов и игр
+            queryset = queryset.prefetch_related(Prefetch(
+                'scheduled_runs',
+                queryset=Run.objects.select_related('game').defer(
+                    'game__announcement', 'game__red_flags', 'game__search_vector'
+                )
+            ))
+        if fields.includes('organizers'):
+            queryset = queryset.prefetch_related('organizers')
+        if fields.includes('links'):
+            queryset = queryset.prefetch_related('convention__links')
+        if not fields.includes('description'):
+            queryset = queryset.defer('convention__description')
+        
+        # Регистрация текущего пользователя подгружается одним запросом на весь список
+        if self.request.user.is_authenticated and fields.includes('current_user_registration'):
+            queryset = queryset.prefetch_related(Prefetch(
+                'event_registrations',
+                queryset=ConventionEventRegistration.objects.filter(user=self.request.user).select_related('user'),
+                to_attr='current_user_registrations'
+            ))
+        
         # Фильтр по конвенту
         convention_id = self.request.query_params.get('convention')
         if convention_id:
@@ -760,6 +890,14 @@ class ConventionEventViewSet(viewsets.ModelViewSet):
         if city:
             queryset = queryset.filter(city__name__iexact=city)
         
+        # Фильтр по id города и пересечению с диапазоном дат (?from=&to=), см. date_range.py
+        city_id = get_city_id(self.request.query_params)
+        if city_id is not None:
+            queryset = queryset.filter(city_id=city_id)
+        date_range = get_date_range(self.request.query_params, required=self.action == 'calendar')
+        if date_range:
+            queryset = filter_events_by_range(queryset, date_range)
+        
         # Фильтр по времени: upcoming (предстоящие) или past (прошедшие)
         time_filter = self.request.query_params.get('time')
         today = date.today()
@@ -770,6 +908,8 @@ class ConventionEventViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(date_end__lt=today)
             return queryset.order_by('-date_start')  # Недавно прошедшие первыми
         
+        if date_range:
+            return queryset.order_by('date_start')  # Календарный порядок
         return queryset.order_by('-date_start')
     
     def perform_create(self, serializer):
@@ -787,12 +927,27 @@ class ConventionEventViewSet(viewsets.ModelViewSet):
         ).distinct().values_list('name', flat=True).order_by('name')
         return Response(list(cities))
     
+    @action(detail=False, methods=['get'])
+    def calendar(self, request):
+        """
+        Проведения, пересекающиеся с диапазоном ?from=&to= (обязательны), по дням
+        для месячного вида афиши; ?city_id= ограничивает город.
+        """
+        queryset = self.get_conditional_queryset()
+        date_range = get_date_range(request.query_params, required=True)
+        return self.cached_response(request, lambda: self.conditional_response(
+            request,
+            queryset,
+            lambda: Response(build_event_calendar(queryset, date_range))
+        ))
+    
     @action(detail=True, methods=['get'])
     def schedule(self, request, pk=None):
         """Получить полное расписание проведения конвента"""
-        event = self.get_object()
-        serializer = ConventionScheduleSerializer(event, context={'request': request})
-        return Response(serializer.data)
+        # Публичная часть расписания берётся из кэша, персональные поля считаются на запрос
+        event = get_object_or_404(ConventionEvent.objects.only('id', 'convention_id'), pk=pk)
+        document = get_schedule_document(event.pk)
+        return Response(personalize_schedule(document, event, request))
     
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def add_run(self, request, pk=None):
@@ -1251,7 +1406,7 @@ class ConventionEventViewSet(viewsets.ModelViewSet):
         })
 
 
-class ConventionLinkViewSet(viewsets.ModelViewSet):
+class ConventionLinkViewSet(SparseFieldsViewMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     """API для ссылок конвентов"""
     serializer_class = ConventionLinkSerializer
     queryset = ConventionLink.objects.all()